@@ -0,0 +1,60 @@
+import argparse
+import importlib
+import os
+import sys
+
+from . import build
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m genny',
+        description='Run registered genny generators whose inputs changed')
+    parser.add_argument('modules', nargs='+',
+                        help='modules that register generators with '
+                             '@genny.build.generator()')
+    parser.add_argument('-o', '--output-dir', default='.')
+    parser.add_argument('-g', '--generator', action='append', dest='names',
+                        help='only run this generator (may be repeated)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='run generators even if inputs are unchanged')
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help='keep running and rebuild on input changes')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='seconds between input checks in watch mode')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.getcwd())
+    for module in args.modules:
+        importlib.import_module(module)
+
+    unknown = [name for name in args.names or () if name not in build.registry]
+    if unknown:
+        for name in unknown:
+            print('unknown generator: ' + name, file=sys.stderr)
+        return 1
+
+    if args.watch:
+        def report(ran, error):
+            print('rebuilt: ' + ', '.join(ran))
+            if error:
+                print(error, file=sys.stderr)
+        try:
+            build.watch(args.names, args.output_dir, args.interval, report)
+        except KeyboardInterrupt:
+            return 0
+
+    try:
+        ran = build.build(args.names, args.output_dir, jobs=args.jobs,
+                          force=args.force)
+    except build.BuildError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print('built: ' + (', '.join(ran) if ran else 'nothing to do'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import importlib
+import inspect
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+STATE_FILE = '.genny-build.json'
+
+Fingerprint = Optional[List[int]]
+InputMap = Dict[str, Fingerprint]
+
+
+class GeneratorError(Exception):
+    def __init__(self, name: str, inputs: InputMap, details: str):
+        self.name = name
+        self.inputs = inputs
+        self.details = details  # formatted traceback
+        super().__init__(name, inputs, details)
+
+    def __str__(self):
+        return f'Generator {self.name} failed:\n{self.details}'
+
+
+class BuildError(Exception):
+    def __init__(self, failures: Dict[str, GeneratorError], ran: List[str]):
+        self.failures = failures
+        self.ran = ran  # all generators that ran, including failed ones
+        super().__init__(failures, ran)
+
+    def __str__(self):
+        return '\n'.join(str(e) for _, e in sorted(self.failures.items()))
+
+
+class Generator:
+    def __init__(self, func: Callable[[BuildContext], None], name: str,
+                 inputs: Iterable[str] = ()):
+        self.func = func
+        self.name = name
+        self.inputs = list(inputs)
+
+
+registry: Dict[str, Generator] = {}
+
+
+def generator(name: Optional[str] = None, inputs: Iterable[str] = ()):
+    """
+    Register a function as a build generator.
+
+    The function is called with a BuildContext. Files read through the
+    context, files listed in inputs and the function's own source file are
+    recorded, and the generator only runs again once one of them changes.
+    """
+    def register(func):
+        gen_name = name or f'{func.__module__}.{func.__qualname__}'
+        registry[gen_name] = Generator(func, gen_name, inputs)
+        return func
+    return register
+
+
+class BuildContext:
+    def __init__(self, name: str, output_dir: str,
+                 cache: Optional[dict] = None):
+        self.name = name
+        self.output_dir = output_dir
+        # kept between rebuilds in watch mode
+        self.cache = cache if cache is not None else {}
+        self.inputs = set()
+
+    def add_input(self, path: str):
+        self.inputs.add(os.path.abspath(path))
+
+    def open(self, path: str, mode: str = 'r', **kwargs):
+        if not any(c in mode for c in 'wax+'):
+            self.add_input(path)
+        return open(path, mode, **kwargs)
+
+    def read_text(self, path: str, encoding: str = 'utf-8') -> str:
+        with self.open(path, encoding=encoding) as f:
+            return f.read()
+
+    def output_path(self, *parts: str) -> str:
+        return os.path.join(self.output_dir, *parts)
+
+
+def fingerprint(path: str) -> Fingerprint:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def fingerprints(paths: Iterable[str]) -> InputMap:
+    return dict((path, fingerprint(path)) for path in sorted(paths))
+
+
+def is_stale(entry: Optional[dict], retry_failed: bool = True) -> bool:
+    if entry is None or (entry['failed'] and retry_failed):
+        return True
+    return any(fingerprint(path) != fp
+               for path, fp in entry['inputs'].items())
+
+
+def run_generator(gen: Generator, output_dir: str,
+                  cache: Optional[dict] = None) -> InputMap:
+    """
+    Run gen and return the fingerprints of the inputs it used. Failures are
+    raised as GeneratorError with the inputs used so far.
+    """
+    context = BuildContext(gen.name, output_dir, cache)
+    for path in gen.inputs:
+        context.add_input(path)
+    try:
+        context.add_input(inspect.getsourcefile(gen.func))
+    except TypeError:
+        pass  # built-in, no source file
+    try:
+        gen.func(context)
+    except Exception:
+        raise GeneratorError(gen.name, fingerprints(context.inputs),
+                             traceback.format_exc())
+    return fingerprints(context.inputs)
+
+
+def load_state(path: str) -> Dict[str, dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path: str, state: Dict[str, dict]):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _select(names: Optional[Iterable[str]]) -> List[Generator]:
+    if names is None:
+        return list(registry.values())
+    unknown = [name for name in names if name not in registry]
+    if unknown:
+        raise KeyError('Unknown generators: ' + ', '.join(unknown))
+    return [registry[name] for name in names]
+
+
+def build(names: Optional[Iterable[str]] = None, output_dir: str = '.',
+          jobs: Optional[int] = None, force: bool = False,
+          caches: Optional[Dict[str, dict]] = None,
+          retry_failed: bool = True) -> List[str]:
+    """
+    Run the registered generators whose inputs changed since the last build
+    (or that failed last time, with retry_failed).
+
+    Generators run in worker processes unless jobs is 1 or caches is given,
+    in which case they run in this process with caches[name] as their
+    context cache. Returns the names of the generators that ran. Raises
+    BuildError after all other generators finished if any of them failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, STATE_FILE)
+    state = load_state(state_path)
+    stale = [gen for gen in _select(names)
+             if force or is_stale(state.get(gen.name), retry_failed)]
+    results = {}
+    failures = {}
+
+    if jobs == 1 or caches is not None or len(stale) < 2:
+        for gen in stale:
+            cache = None if caches is None else caches.setdefault(gen.name,
+                                                                  {})
+            try:
+                results[gen.name] = run_generator(gen, output_dir, cache)
+            except GeneratorError as e:
+                failures[gen.name] = e
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [(gen, executor.submit(run_generator, gen, output_dir))
+                       for gen in stale]
+            for gen, future in futures:
+                try:
+                    results[gen.name] = future.result()
+                except GeneratorError as e:
+                    failures[gen.name] = e
+
+    for name, inputs in results.items():
+        state[name] = {'inputs': inputs, 'failed': False}
+    for name, error in failures.items():
+        state[name] = {'inputs': error.inputs, 'failed': True}
+    if stale:
+        save_state(state_path, state)
+    ran = [gen.name for gen in stale]
+    if failures:
+        raise BuildError(failures, ran)
+    return ran
+
+
+def reload_changed(names: Optional[Iterable[str]], sources: InputMap,
+                   broken: set) -> List[str]:
+    """
+    Reload the modules of the selected generators whose source file changed
+    since the last call, which registers their generators again. Returns
+    the names of the reloaded modules. sources keeps the fingerprints
+    between calls; modules that failed to reload are kept in broken until
+    they reload, and the error is raised.
+    """
+    reloaded = []
+    module_names = set(gen.func.__module__ for gen in _select(names))
+    for module_name in sorted(module_names):
+        module = sys.modules.get(module_name)
+        path = getattr(module, '__file__', None)
+        if path is None or module_name == '__main__':
+            continue  # cannot be reloaded
+        current = fingerprint(path)
+        if sources.setdefault(module_name, current) == current:
+            continue
+        sources[module_name] = current
+        try:
+            importlib.reload(module)
+        except Exception:
+            broken.add(module_name)
+            raise
+        broken.discard(module_name)
+        reloaded.append(module_name)
+    return reloaded
+
+
+def watch(names: Optional[Iterable[str]] = None, output_dir: str = '.',
+          interval: float = 1.0,
+          on_build: Optional[Callable[[List[str],
+                                       Optional[BuildError]], None]] = None):
+    """
+    Rebuild whenever inputs change, until interrupted.
+
+    Generators run in this process and keep their context cache between
+    rebuilds, so they can hold on to trees that did not change. A failed
+    generator is retried once its inputs change. Modules of generators are
+    reloaded when their source changes, dropping the caches of their
+    generators; nothing is built while a module fails to reload.
+    """
+    caches = {}
+    sources = {}
+    broken = set()
+    retry_failed = True
+    while True:
+        try:
+            for module_name in reload_changed(names, sources, broken):
+                for gen in _select(names):
+                    if gen.func.__module__ == module_name:
+                        caches.pop(gen.name, None)
+        except Exception:
+            if on_build:
+                error = GeneratorError('reload', {}, traceback.format_exc())
+                on_build([], BuildError({'reload': error}, []))
+        if broken:
+            time.sleep(interval)
+            continue
+        try:
+            ran = build(names, output_dir, caches=caches,
+                        retry_failed=retry_failed)
+            error = None
+        except BuildError as e:
+            ran = e.ran
+            error = e
+        retry_failed = False
+        if on_build and ran:
+            on_build(ran, error)
+        time.sleep(interval)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+TASKS_PER_WORKER = 4  # chunks per worker, to even out uneven statements
+
+# the children of the render in progress, inherited by forked workers so
+# that they do not have to be pickled
+_inherited: Optional[Tuple[type, list]] = None
+
+
+def render(node, render_list: List[str], indent, workers: int) -> str:
+    """
+    Render node with its children rendered in worker processes.
+
+    Works for py2py and py2js trees alike: render_list and indent are the
+    arguments the node's render_to_list() takes. node.iter_render() is run
+    here, leaving a slot in render_list for every child it yields; the
+    children are split into contiguous chunks that are rendered by
+    workers processes and put back in their slots, so the text is the same
+    as that of a serial render. Only the children of node are distributed,
+    their own children are rendered by the worker that got them.
+
+    Where processes can be forked the workers get the tree from the parent
+    and only the rendered text is sent back. Elsewhere every chunk is
+    pickled, which can cost more than it saves; chunks that cannot be
+    pickled, e.g. because they are nested too deeply, are rendered here.
+    """
+    global _inherited
+    slots = []
+    items = []  # (child, indent, list indent level)
+    for child, child_indent in node.iter_render(render_list, indent):
+        slots.append(len(render_list))
+        items.append((child, child_indent,
+                      getattr(render_list, 'indent_level', None)))
+        list.append(render_list, '')
+
+    list_type = type(render_list)
+    if workers == 1 or len(items) < 2:
+        texts = _render_chunk(list_type, items)
+    else:
+        chunk_count = min(len(items), workers * TASKS_PER_WORKER)
+        size = -(-len(items) // chunk_count)
+        starts = range(0, len(items), size)
+        if 'fork' in multiprocessing.get_all_start_methods():
+            _inherited = (list_type, items)
+            try:
+                with ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context('fork')
+                ) as executor:
+                    results = list(executor.map(
+                        _render_inherited, starts, [size] * len(starts)))
+            finally:
+                _inherited = None
+        else:
+            try:
+                chunks = [pickle.dumps((list_type, items[i:i + size]))
+                          for i in starts]
+            except (RecursionError, pickle.PicklingError):
+                chunks = None  # e.g. too deep to pickle
+            if chunks is None:
+                results = [_render_chunk(list_type, items)]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(_render_pickled, chunks))
+        texts = [text for result in results for text in result]
+
+    for index, text in zip(slots, texts):
+        render_list[index] = text
+    return ''.join(render_list)
+
+
+def _render_inherited(start: int, size: int) -> List[str]:
+    list_type, items = _inherited
+    return _render_chunk(list_type, items[start:start + size])
+
+
+def _render_pickled(chunk: bytes) -> List[str]:
+    return _render_chunk(*pickle.loads(chunk))
+
+
+def _render_chunk(list_type, items) -> List[str]:
+    texts = []
+    for child, indent, list_indent_level in items:
+        render_list = list_type()
+        if list_indent_level is not None:
+            render_list.indent_level = list_indent_level
+        child.render_to_list(render_list, indent)
+        texts.append(''.join(render_list))
+    return texts
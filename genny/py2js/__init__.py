@@ -1,6 +1,13 @@
 from __future__ import absolute_import, unicode_literals
 
-from .base import BlankLine, make_bool, quote_text
+from .base import (
+    BlankLine,
+    Py2JSException,
+    clear_interned_leaves,
+    intern_leaf,
+    make_bool,
+    quote_text,
+)
 
 from .statements import (
     ArrayLiteral,
@@ -16,9 +23,11 @@ from .statements import (
     ObjectLiteral,
     Param,
     RecordTypedef,
+    Region,
     Return,
     SingleLineComment,
     TypeAnnotation,
 )
 
 from .jsfile import JSFile
+from .project import JSProject
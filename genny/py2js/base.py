@@ -1,15 +1,25 @@
 from __future__ import absolute_import, unicode_literals
 
 
+from collections import deque
 from contextlib import contextmanager
 import copy
+import functools
 import six
+import weakref
 
 
 INDENT = ' ' * 4  # 4 spaces
 EOS = ';'  # end of statement
 EOL = '\n'  # unix end of line
 
+# share a single instance between identical leaf statements (opt-in)
+INTERN_LEAVES = False
+
+
+class Py2JSException(Exception):
+    pass
+
 
 class IndentedRenderList(list):
     def __init__(self, *args, **kwargs):
@@ -45,20 +55,70 @@ class IndentedRenderList(list):
 
 
 class Renderable(object):
-    def render_to_list(self, render_list, do_indent=True):
-        raise NotImplementedError('render_to_list() should be implemented by '
-                                  'all statements')
+    # generator for nodes with children, see render_tree()
+    iter_render = None
+    unique_symbol = False  # True for definitions, see symbols.SymbolTable
+
+    def symbol_names(self):
+        """
+        The names this statement binds in its scope
+        """
+        return []
 
-    def render(self):
+    def render_to_list(self, render_list, do_indent=True):
+        if self.iter_render is None:
+            raise NotImplementedError('render_to_list() or iter_render() '
+                                      'should be implemented by all '
+                                      'statements')
+        render_tree(self, render_list, do_indent)
+
+    def render(self, workers=None):
+        """
+        With workers, the statements directly below this one are rendered
+        in that many worker processes, see parallel.render() (Python 3 only)
+        """
+        if workers is not None and self.iter_render is not None:
+            from .. import parallel
+            return parallel.render(self, IndentedRenderList(), True, workers)
+        return ''.join(self.render_fragments())
+
+    def render_fragments(self):
         render_list = IndentedRenderList()
         self.render_to_list(render_list)
-        return ''.join(render_list)
+        return render_list
+
+    def iter_render_steps(self, render_list, do_indent=True):
+        """
+        render_to_list() one node at a time, yielding after every node that
+        was rendered, see streaming.iter_chunks()
+        """
+        if self.iter_render is None:
+            self.render_to_list(render_list, do_indent)
+            return iter(())
+        return iter_render_generator(self.iter_render(render_list, do_indent),
+                                     render_list)
+
+    def render_chunks(self, chunk_size=None):
+        """
+        Yield the rendering in chunks of at most chunk_size characters, see
+        streaming.iter_chunks() (Python 3 only)
+        """
+        from .. import streaming
+        return streaming.iter_chunks(self, IndentedRenderList(), True,
+                                     chunk_size or streaming.CHUNK_SIZE)
+
+    def arender(self, chunk_size=None, encoding=None):
+        """
+        Async generator of the rendering in chunks, for use with async for.
+        Control returns to the event loop after every chunk (Python 3 only).
+        """
+        from .. import streaming
+        return streaming.arender(self, IndentedRenderList(), True,
+                                 chunk_size or streaming.CHUNK_SIZE, encoding)
 
 
 class Statement(Renderable):
-    def render_to_list(self, render_list, do_indent=True):
-        raise NotImplementedError('render_to_list() should be implemented by '
-                                  'all statements')
+    pass
 
 
 class SimpleStatement(Statement):
@@ -84,6 +144,8 @@ class CodeFragment(Renderable):
     """
     A collection of statements
     """
+    symbols = None  # a symbols.SymbolTable for files
+
     def __init__(self):
         self.statements = []
 
@@ -94,16 +156,24 @@ class CodeFragment(Renderable):
     def add(self, statement):
         if isinstance(statement, six.string_types):
             if statement.strip() == '':
-                statement = BlankLine()
+                statement = intern_leaf(BlankLine) if INTERN_LEAVES \
+                    else BlankLine()
+            elif INTERN_LEAVES:
+                statement = intern_leaf(SimpleStatement, statement.strip())
             else:
                 # convert to SimpleStatement
                 statement = SimpleStatement(statement)
 
+        if self.symbols is not None:
+            self.symbols.add(statement)
         self.statements.append(statement)
         return statement
 
     def clear(self):
-        self.statements.clear()
+        if self.symbols is not None:
+            for statement in self.statements:
+                self.symbols.discard(statement)
+        del self.statements[:]
 
     def create_copy(self):
         c = CodeFragment()
@@ -113,9 +183,9 @@ class CodeFragment(Renderable):
     def is_empty(self):
         return len(self.statements) == 0
 
-    def render_to_list(self, render_list, do_indent=True):
+    def iter_render(self, render_list, do_indent=True):
         for statement in self.statements:
-            statement.render_to_list(render_list, do_indent=do_indent)
+            yield statement, do_indent
 
 
 class CodeBlock(Renderable):
@@ -150,10 +220,10 @@ class CodeBlock(Renderable):
     def is_empty(self):
         return self.code_fragment.is_empty()
 
-    def render_to_list(self, render_list, do_indent=False):
+    def iter_render(self, render_list, do_indent=False):
         render_list.append('{\n', do_indent)
         with render_list.indent_block():
-            self.code_fragment.render_to_list(render_list)
+            yield self.code_fragment, True
         render_list.append('}', add_eos=self.add_eos, add_eol=True)
 
 
@@ -169,10 +239,12 @@ class BlockStatement(Statement):
         self.delegated_block = block
 
     def __getattr__(self, item):
-        if self.delegated_block:
-            return getattr(self.delegated_block, item)
+        # looked up in __dict__ as it is still empty while unpickling
+        delegated_block = self.__dict__.get('delegated_block')
+        if delegated_block:
+            return getattr(delegated_block, item)
         else:
-            raise AttributeError()
+            raise AttributeError(item)
 
     def write(self, statement):
         if self.delegated_block:
@@ -183,18 +255,108 @@ class BlockStatement(Statement):
         if self.delegated_block:
             return self.delegated_block.add(statement)
 
-    def render_to_list(self, render_list, do_indent=True):
-        raise NotImplementedError('render_to_list() should be implemented by '
-                                  'all statements')
+
+def render_tree(node, render_list, do_indent=True):
+    """
+    Render node and all its descendants without recursion.
+
+    Nodes with children implement iter_render(), a generator that appends
+    its own text to render_list and yields (child, do_indent) for each child.
+    The child is rendered before the generator is resumed, so indent_block()
+    contexts held across a yield apply to the child. The depth of the tree is
+    limited only by memory. Leaves just implement render_to_list().
+    """
+    deque(iter_render_generator(node.iter_render(render_list, do_indent),
+                                render_list), maxlen=0)
+
+
+def iter_render_generator(generator, render_list):
+    """
+    Run an iter_render() generator to completion like render_tree(),
+    yielding after every node it renders, so the text rendered so far can
+    be handed out before the rest of the tree is done
+    """
+    stack = [generator]
+    while stack:
+        for child, child_do_indent in stack[-1]:
+            if child.iter_render is None:
+                child.render_to_list(render_list, do_indent=child_do_indent)
+                yield
+            else:
+                stack.append(child.iter_render(render_list, child_do_indent))
+                break
+        else:
+            stack.pop()
+        yield
+
+
+# entries go away with the last tree using them
+_leaf_cache = weakref.WeakValueDictionary()
+
+
+def intern_leaf(cls, *args):
+    """
+    Return the shared instance of cls(*args), creating it on first use.
+    Only use this for leaves that are not modified after creation.
+    """
+    key = (cls,) + args
+    leaf = _leaf_cache.get(key)
+    if leaf is None:
+        leaf = _leaf_cache[key] = cls(*args)
+    return leaf
+
+
+def clear_interned_leaves():
+    _leaf_cache.clear()
+
+
+def _make_escape_table():
+    table = dict((c, '\\x{:02x}'.format(c)) for c in range(0x20))
+    table.update({
+        ord('\\'): '\\\\',
+        ord('\b'): '\\b',
+        ord('\f'): '\\f',
+        ord('\n'): '\\n',
+        ord('\r'): '\\r',
+        ord('\t'): '\\t',
+        ord('\v'): '\\v',
+        0x7f: '\\x7f',
+    })
+    # line terminators in JS string literals and lone surrogates (which
+    # cannot be encoded to utf-8)
+    for c in [0x2028, 0x2029] + list(range(0xd800, 0xe000)):
+        table[c] = '\\u{:04x}'.format(c)
+    return table
+
+
+_ESCAPE_TABLE = _make_escape_table()
+_quote_escape_tables = {}
+QUOTE_CACHE_SIZE = 4096
+
+
+def _get_escape_table(quote_char):
+    table = _quote_escape_tables.get(quote_char)
+    if table is None:
+        table = dict(_ESCAPE_TABLE)
+        table[ord(quote_char)] = '\\' + quote_char
+        _quote_escape_tables[quote_char] = table
+    return table
+
+
+@functools.lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def _quote_text(text, quote_char):
+    return quote_char + text.translate(_get_escape_table(quote_char)) + \
+        quote_char
 
 
 def quote_text(text, quote_char="'"):
-    # return quote_char + text + quote_char
-    escaped = repr(text)  # returns u"text\'s representation"
-    if escaped[0] == 'u':
-        return escaped[1:]
-    else:
-        return escaped
+    """
+    Return text as a JS string literal. Results are cached, so repeated
+    literals are cheap.
+    """
+    if not isinstance(text, six.text_type):
+        text = six.text_type(text)
+    return _quote_text(text, quote_char)
 
 
 def make_bool(value):
@@ -3,14 +3,41 @@ from __future__ import absolute_import, unicode_literals
 
 from . import base
 from .import statements
+from . import treeshake
+from .. import regions, telemetry, writers
+from ..symbols import SymbolTable
+import os
 
 
 class JSFile(base.CodeFragment):
-    def __init__(self):
+    def __init__(self, es_module=False, tree_shake=False):
+        """
+        With es_module, the file is rendered with import/export statements
+        instead of goog.provide/goog.require. With tree_shake, top-level
+        definitions not reachable from the exports are left out.
+        """
         super(JSFile, self).__init__()
         self.goog_provides = []
         self.goog_requires = []
         self.comment = None
+        self.es_module = es_module
+        self.tree_shake = tree_shake
+        self.es_imports = []  # (module path, default name, names)
+        self.exports = []
+        self.symbols = SymbolTable(base.Py2JSException)
+
+    def lookup(self, qualified_name):
+        """
+        Return the top-level statement (or class method, for names like
+        "Class.method") that binds qualified_name last, or None
+        """
+        return self.symbols.lookup(qualified_name)
+
+    def duplicates(self):
+        """
+        Return the names of top-level definitions made more than once
+        """
+        return self.symbols.duplicates()
 
     def add_goog_provide(self, provides_text):
         self.goog_provides.append(provides_text)
@@ -18,10 +45,45 @@ class JSFile(base.CodeFragment):
     def add_goog_requires(self, requires_text):
         self.goog_requires.append(requires_text)
 
+    def add_import(self, module_path, names=None, default=None):
+        self._check_es_module('import')
+        self.es_imports.append((module_path, default, list(names or [])))
+
+    def add_export(self, *names):
+        self._check_es_module('export')
+        for name in names:
+            if name not in self.exports:
+                self.exports.append(name)
+
+    def _check_es_module(self, keyword):
+        if not self.es_module:
+            raise base.Py2JSException(
+                'Only an ES module can {} names'.format(keyword))
+
     def add_file_comment(self, text):
         self.comment = text
 
-    def render_to_list(self, render_list, do_indent=True):
+    def render_es_imports(self, render_list, do_indent=True):
+        for module_path, default, names in self.es_imports:
+            specifiers = []
+            if default:
+                specifiers.append(default)
+            if names:
+                specifiers.append('{{ {} }}'.format(', '.join(names)))
+            if specifiers:
+                text = 'import {} from {}'.format(
+                    ', '.join(specifiers), base.quote_text(module_path))
+            else:
+                text = 'import {}'.format(base.quote_text(module_path))
+            render_list.append(text, do_indent=do_indent,
+                               add_eos=True, add_eol=True)
+        if self.es_imports:
+            render_list.append_blank_line()
+
+    def iter_render(self, render_list, do_indent=True):
+        if self.es_module and (self.goog_provides or self.goog_requires):
+            raise base.Py2JSException('An ES module cannot use goog.provide '
+                                      'or goog.require')
         if self.comment:
             statements.MultiLineComment(
                 self.comment
@@ -30,6 +92,20 @@ class JSFile(base.CodeFragment):
                 do_indent=do_indent
             )
             render_list.append_blank_line()
+        if self.es_module:
+            self.render_es_imports(render_list, do_indent)
+            if self.tree_shake:
+                for text in treeshake.shake(self.statements, self.exports):
+                    render_list.append(text, do_indent=False)
+            else:
+                for item in super(JSFile, self).iter_render(render_list):
+                    yield item
+            if self.exports:
+                render_list.append(
+                    'export {{ {} }}'.format(', '.join(self.exports)),
+                    do_indent=do_indent, add_eos=True, add_eol=True)
+            return
+
         for provide in sorted(self.goog_provides):
             render_list.append(
                 'goog.provide({})'.format(base.quote_text(provide)),
@@ -48,8 +124,37 @@ class JSFile(base.CodeFragment):
             )
         render_list.append('\n')
 
-        super(JSFile, self).render_to_list(render_list)
+        for item in super(JSFile, self).iter_render(render_list):
+            yield item
 
-    def save(self, path):
-        with open(path, 'wb') as f:
-            f.write(self.render().encode('utf-8'))
+    def save(self, path, vectored=False, update_regions=False,
+             listener=None):
+        """
+        With update_regions, an existing file only has its generated regions
+        (see CodeFragment.region_()) replaced and is left untouched if none
+        changed. The listener (a telemetry.SaveListener) is told about the
+        file written.
+        """
+        with telemetry.run(listener):
+            stats = None
+            if listener is not None:
+                stats = telemetry.FileStats(path)
+                stats.node_count = telemetry.count_nodes(self,
+                                                         base.Renderable)
+            if update_regions and os.path.exists(path):
+                text = telemetry.time_render(stats, self.render)
+                start = telemetry.clock()
+                changed = regions.update_regions(path, text, '//')
+                if stats is not None:
+                    stats.write_time = telemetry.clock() - start
+                    if changed:
+                        stats.bytes_written = os.path.getsize(path)
+            elif vectored:
+                fragments = telemetry.time_render(stats,
+                                                  self.render_fragments)
+                writers.write_fragments(path, fragments, stats=stats)
+            else:
+                text = telemetry.time_render(stats, self.render)
+                writers.write_text(path, text, stats=stats)
+            if listener is not None:
+                listener.file_saved(stats)
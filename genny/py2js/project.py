@@ -0,0 +1,138 @@
+from __future__ import absolute_import, unicode_literals
+
+
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import os
+
+from . import base
+from .jsfile import JSFile
+from .. import writers
+
+
+class JSProject(object):
+    """
+    A set of JSFiles indexed by their goog.provide/goog.require namespaces
+    """
+    def __init__(self):
+        self.files = {}  # path -> JSFile
+
+    def add_file(self, path, js_file=None):
+        if path in self.files:
+            raise base.Py2JSException('Duplicate file "{}"'.format(path))
+        if js_file is None:
+            js_file = JSFile()
+        self.files[path] = js_file
+        return js_file
+
+    def get_provider_index(self):
+        """
+        Return a dict mapping each provided namespace to the file path
+        """
+        index = {}
+        for path, js_file in self.files.items():
+            for provide in js_file.goog_provides:
+                if provide in index and index[provide] != path:
+                    raise base.Py2JSException(
+                        '"{}" provided by both "{}" and "{}"'.format(
+                            provide, index[provide], path))
+                index[provide] = path
+        return index
+
+    def get_dependencies(self, path, index=None):
+        """
+        Return the paths of project files required by path. Namespaces not
+        provided in the project are treated as external and ignored.
+        """
+        if index is None:
+            index = self.get_provider_index()
+        deps = set()
+        for require in self.files[path].goog_requires:
+            dep = index.get(require)
+            if dep is not None and dep != path:
+                deps.add(dep)
+        return deps
+
+    def ordered_paths(self):
+        """
+        Return the file paths in dependency order, ties broken by path
+        """
+        index = self.get_provider_index()
+        dependants = dict((path, []) for path in self.files)
+        pending = {}
+        for path in self.files:
+            deps = self.get_dependencies(path, index)
+            pending[path] = len(deps)
+            for dep in deps:
+                dependants[dep].append(path)
+
+        ready = [path for path, count in pending.items() if count == 0]
+        heapq.heapify(ready)
+        ordered = []
+        while ready:
+            path = heapq.heappop(ready)
+            ordered.append(path)
+            for dependant in dependants[path]:
+                pending[dependant] -= 1
+                if pending[dependant] == 0:
+                    heapq.heappush(ready, dependant)
+
+        if len(ordered) != len(self.files):
+            cycle = sorted(path for path, count in pending.items() if count)
+            raise base.Py2JSException(
+                'Circular goog.require between: {}'.format(', '.join(cycle)))
+        return ordered
+
+    def render_all(self, workers=None):
+        """
+        Render all files in dependency order. Returns a list of
+        (path, text) tuples. Files are rendered in worker processes unless
+        workers is 1.
+        """
+        paths = self.ordered_paths()
+        js_files = [self.files[path] for path in paths]
+        if workers == 1 or len(js_files) < 2:
+            texts = [js_file.render() for js_file in js_files]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                texts = list(executor.map(_render_file, js_files))
+        return list(zip(paths, texts))
+
+    def render_deps(self, base_path=''):
+        """
+        Render a Closure deps file (goog.addDependency calls) for the project
+        """
+        render_list = base.IndentedRenderList()
+        for path in self.ordered_paths():
+            js_file = self.files[path]
+            render_list.append(
+                'goog.addDependency({}, [{}], [{}])'.format(
+                    base.quote_text(base_path + path),
+                    ', '.join(base.quote_text(x)
+                              for x in sorted(js_file.goog_provides)),
+                    ', '.join(base.quote_text(x)
+                              for x in sorted(js_file.goog_requires))),
+                add_eos=True,
+                add_eol=True
+            )
+        return ''.join(render_list)
+
+    def save(self, dir_name, workers=None):
+        for path, text in self.render_all(workers):
+            file_name = os.path.join(dir_name, path)
+            parent_dir = os.path.dirname(file_name)
+            if parent_dir and not os.path.isdir(parent_dir):
+                os.makedirs(parent_dir)
+            with open(file_name, 'wb') as f:
+                f.write(text.encode('utf-8'))
+
+    def save_bundle(self, path, workers=None):
+        """
+        Concatenate all files in dependency order into a single file
+        """
+        rendered = self.render_all(workers)
+        writers.write_fragments(path, (text for _, text in rendered))
+
+
+def _render_file(js_file):
+    return js_file.render()
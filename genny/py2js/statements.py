@@ -4,6 +4,8 @@ from __future__ import absolute_import, unicode_literals
 import copy
 
 from . import base
+from .. import regions
+from ..symbols import SymbolTable
 
 
 class Assign(base.Statement):
@@ -31,6 +33,9 @@ class Let(base.Statement):
         self.add_let = add_let
         self.type_str = type_str
 
+    def symbol_names(self):
+        return [self.var_name] if self.var_name.isidentifier() else []
+
     def render_to_list(self, render_list, do_indent=True):
         if self.type_str:
             TypeAnnotation(self.type_str).render_to_list(
@@ -84,18 +89,18 @@ class If(base.BlockStatement):
         self.else_if_blocks.append(else_if_block)
         return else_if_block
 
-    def render_to_list(self, render_list, do_indent=True):
+    def iter_render(self, render_list, do_indent=True):
         render_list.append('if ({}) '.format(self.condition),
                            do_indent=self.indent_first_line)
-        self.if_block.render_to_list(render_list, do_indent=False)
+        yield self.if_block, False
 
         for else_if_block in self.else_if_blocks:  # type: If
             render_list.append('else ')
-            else_if_block.render_to_list(render_list, do_indent=False)
+            yield else_if_block, False
 
         if not self.else_block.is_empty():
             render_list.append('else ')
-            self.else_block.render_to_list(render_list, do_indent=False)
+            yield self.else_block, False
 
 
 # monkey patch into code
@@ -103,6 +108,27 @@ base.CodeFragment.if_ = lambda self, condition: \
     self.add(If(condition))
 
 
+class Region(base.CodeFragment):
+    """
+    Statements between generated region markers, see JSFile.save()
+    """
+    shares_symbols = True
+
+    def __init__(self, name):
+        super(Region, self).__init__()
+        self.name = name
+
+    def iter_render(self, render_list, do_indent=True):
+        render_list.append(regions.begin_marker('//', self.name),
+                           add_eol=True)
+        for item in super(Region, self).iter_render(render_list, do_indent):
+            yield item
+        render_list.append(regions.end_marker('//', self.name), add_eol=True)
+
+
+base.CodeFragment.region_ = lambda self, name: self.add(Region(name))
+
+
 class Param(object):
     def __init__(self, name, type_str):
         self.name = name
@@ -119,6 +145,8 @@ class Param(object):
 
 
 class Function(base.BlockStatement):
+    unique_symbol = True
+
     def __init__(self, name='', params=None, return_type_str=None,
                  comment='', add_eos=False):
         self.name = name
@@ -129,7 +157,10 @@ class Function(base.BlockStatement):
 
         super(Function, self).__init__(delegated_block=self.code_block)
 
-    def render_to_list(self, render_list, do_indent=True):
+    def symbol_names(self):
+        return [self.name] if self.name else []
+
+    def iter_render(self, render_list, do_indent=True):
         FunctionAnnotation(
             self.params,
             return_type_str=self.return_type_str,
@@ -145,7 +176,7 @@ class Function(base.BlockStatement):
             ),
             do_indent=do_indent
         )
-        self.code_block.render_to_list(render_list, do_indent=do_indent)
+        yield self.code_block, do_indent
 
 
 base.CodeFragment.function_ = lambda self, name='', params=None: \
@@ -168,17 +199,35 @@ base.CodeFragment.call_ = lambda self, name, params=None, add_eos=True: \
 
 
 class Class(base.BlockStatement):
+    unique_symbol = True
+
     def __init__(self, name='', base_class=None, add_eos=False):
         self.name = name
         self.base_class = base_class
         self.code_block = base.CodeBlock(add_eos=add_eos)
         self.constructor = None
         self.methods = []
+        self.symbols = SymbolTable(base.Py2JSException)  # the methods
 
         super(Class, self).__init__(delegated_block=self.code_block)
 
+    def symbol_names(self):
+        return [self.name] if self.name else []
+
+    def lookup(self, qualified_name):
+        """
+        Return the method named qualified_name, or None
+        """
+        return self.symbols.lookup(qualified_name)
+
+    def duplicates(self):
+        return self.symbols.duplicates()
+
     def constructor_(self, params=None):
+        if self.constructor:
+            self.symbols.discard(self.constructor)
         self.constructor = ClassMethod('constructor', params)
+        self.symbols.add(self.constructor)
         return self.constructor
 
     def add_method(self, name, is_static=False, params=None,
@@ -186,10 +235,11 @@ class Class(base.BlockStatement):
         method = ClassMethod(name, params, is_static=is_static,
                              return_type_str=return_type_str,
                              comment=comment)
+        self.symbols.add(method)
         self.methods.append(method)
         return method
 
-    def render_to_list(self, render_list, do_indent=True):
+    def iter_render(self, render_list, do_indent=True):
         # render using a temporary code block
         # this allows multiple calls to this method
         code_block = copy.deepcopy(self.code_block)
@@ -206,7 +256,7 @@ class Class(base.BlockStatement):
             code_block.add(self.constructor)
         for method in self.methods:
             code_block.add(method)
-        code_block.render_to_list(render_list, do_indent=do_indent)
+        yield code_block, do_indent
 
 
 base.CodeFragment.class_ = \
@@ -216,6 +266,8 @@ base.CodeFragment.class_ = \
 
 
 class ClassMethod(base.BlockStatement):
+    unique_symbol = True
+
     def __init__(self, name, params=None, is_static=False,
                  return_type_str=None, comment=''):
         self.name = name
@@ -227,10 +279,16 @@ class ClassMethod(base.BlockStatement):
 
         super(ClassMethod, self).__init__(delegated_block=self.code_block)
 
+    def symbol_names(self):
+        return [self.name]
+
     def return_(self, value=None):
-        self.code_block.add(Return(value))
+        if value is None and base.INTERN_LEAVES:
+            self.code_block.add(base.intern_leaf(Return, None))
+        else:
+            self.code_block.add(Return(value))
 
-    def render_to_list(self, render_list, do_indent=True):
+    def iter_render(self, render_list, do_indent=True):
         FunctionAnnotation(
             self.params,
             return_type_str=self.return_type_str,
@@ -246,7 +304,7 @@ class ClassMethod(base.BlockStatement):
                 ', '.join([x.name for x in self.params])
             )
         )
-        self.code_block.render_to_list(render_list, do_indent=False)
+        yield self.code_block, False
 
 
 class SingleLineComment(base.Statement):
@@ -364,11 +422,11 @@ class ObjectLiteral(base.Renderable):
     def add_member(self, lhs, rhs):
         self.members.append(ObjectLiteralMember(lhs, rhs))
 
-    def render_to_list(self, render_list, do_indent=False):
+    def iter_render(self, render_list, do_indent=False):
         render_list.append('{\n', do_indent=False)
         with render_list.indent_block():
             for member in self.members:  # type: ObjectLiteralMember
-                member.render_to_list(render_list, do_indent=do_indent)
+                yield member, do_indent
 
         render_list.append('}', add_eos=self.add_eos, add_eol=self.add_eol)
 
@@ -383,14 +441,14 @@ class ArrayLiteral(base.Renderable):
     def add_element(self, element):
         self.elements.append(element)
 
-    def render_to_list(self, render_list, do_indent=False):
+    def iter_render(self, render_list, do_indent=False):
         render_list.append('[\n', do_indent=False)
         with render_list.indent_block():
             for element in self.elements:  # type: base.Renderable
                 if not hasattr(element, 'render_to_list'):
                     element = base.SimpleStatement(element, add_eos=False,
                                                    add_eol=False)
-                element.render_to_list(render_list, do_indent=False)
+                yield element, False
                 render_list.append(',', do_indent=False, add_eol=False)
 
         render_list.append(']', add_eos=self.add_eos, add_eol=self.add_eol)
@@ -0,0 +1,94 @@
+from __future__ import absolute_import, unicode_literals
+
+
+import re
+
+import six
+
+from . import base
+from . import statements
+
+IDENTIFIER = re.compile(r'[A-Za-z_$][\w$]*')
+LITERAL = re.compile(
+    r'-?(?:0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)'
+    r'|"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\''
+    r'|true|false|null|undefined|\[\]|\{\}')
+
+
+def _simple_name(text):
+    if isinstance(text, six.string_types):
+        text = text.strip()
+        if IDENTIFIER.match(text) and IDENTIFIER.match(text).end() == \
+                len(text):
+            return text
+    return None
+
+
+def is_pure(rhs):
+    """
+    True if evaluating rhs has no side effects: no value, a literal or a
+    function expression
+    """
+    if rhs is None or isinstance(rhs, statements.Function):
+        return True
+    if isinstance(rhs, six.string_types):
+        text = rhs.strip()
+        match = LITERAL.match(text)
+        return match is not None and match.end() == len(text)
+    return False
+
+
+def defined_name(statement):
+    """
+    Return the top-level symbol defined by statement, or None if the
+    statement has to be kept regardless of what is referenced. Variables
+    are only left out if their value has no side effects, see is_pure().
+    """
+    if isinstance(statement, (statements.Function, statements.Class,
+                              statements.RecordTypedef)):
+        return _simple_name(statement.name)
+    if isinstance(statement, statements.Let) and is_pure(statement.rhs):
+        return _simple_name(statement.var_name)
+    if isinstance(statement, statements.Assign) and is_pure(statement.rhs):
+        return _simple_name(statement.lhs)
+    return None
+
+
+def render_statement(statement):
+    render_list = base.IndentedRenderList()
+    statement.render_to_list(render_list)
+    return ''.join(render_list)
+
+
+def shake(statement_list, exports):
+    """
+    Return the rendered text of the statements reachable from exports and
+    from statements that do not define a symbol, in their original order.
+
+    References are found by scanning the rendered text for identifiers, so
+    a name mentioned in a string or comment keeps its definition alive.
+    """
+    texts = [render_statement(x) for x in statement_list]
+    names = [defined_name(x) for x in statement_list]
+    definitions = {}
+    for i, name in enumerate(names):
+        if name is not None:
+            definitions.setdefault(name, []).append(i)
+
+    missing = [name for name in exports if name not in definitions]
+    if missing:
+        raise base.Py2JSException(
+            'Exported names not defined: {}'.format(', '.join(missing)))
+
+    pending = [i for i, name in enumerate(names) if name is None]
+    for name in exports:
+        pending.extend(definitions[name])
+    kept = set()
+    while pending:
+        i = pending.pop()
+        if i in kept:
+            continue
+        kept.add(i)
+        for identifier in set(IDENTIFIER.findall(texts[i])):
+            pending.extend(definitions.get(identifier, ()))
+    return [text for i, text in enumerate(texts) if i in kept]
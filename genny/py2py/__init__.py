@@ -1,8 +1,14 @@
-from .base import Py2PyException, SimpleStatement, Suite
+from .base import (
+    Py2PyException, SimpleStatement, Suite,
+    clear_interned_leaves, intern_leaf)
+from .compact import CompactTree
+from .importer import MemoryImporter, clear_code_cache
 from .modules import Module
-from .packages import Package
+from .optimize import Optimizer, optimize
+from .packages import Package, PackageWriter
+from .parser import SourceText, parse_file, parse_module
 from .statements import (
     Assign, BlankLine,
-    ClassStatement, DefStatement, ForStatement, FunctionCall, IfStatement,
-    TryStatement,
-    WhileStatement, WithStatement)
+    ClassStatement, DefStatement, DispatchTable, ForStatement, FunctionCall,
+    IfStatement, MatchStatement, NumericArray, Parameter, Region,
+    TryStatement, WhileStatement, WithStatement)
@@ -1,8 +1,13 @@
 from __future__ import annotations
+import copy
+import sys
+import weakref
+from collections import deque
 from typing import List, Optional, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from . import statements
+    from . import compact, statements
+    from ..symbols import SymbolTable
 
 INDENT = ' ' * 4  # 4 spaces
 
@@ -10,6 +15,9 @@ CAN_RENDER_SUITES_INLINE = False
 INLINE_STATEMENT_EOS = ';'
 BLOCK_STATEMENT_EOS = '\n'
 
+# share a single instance between identical leaf statements (opt-in)
+INTERN_LEAVES = False
+
 RenderList = List[str]
 
 
@@ -26,20 +34,120 @@ class Expression:
 
 
 class Renderable:
+    shared = False  # True for interned leaves, see intern_leaf()
+    iter_render = None  # generator for nodes with children, see render_tree()
+    # weak references are dropped when pickling or copying, the owner
+    # restores them in __setstate__()
+    weak_attributes = ('_parent_ref',)
+    unique_symbol = False  # True for definitions, see symbols.SymbolTable
+
     def __init__(self, parent: Optional[Renderable] = None):
-        self.parent: Optional[Renderable] = parent
+        self.parent = parent
 
-    def render_to_list(self, render_list: RenderList, indent_level: int):
-        raise NotImplementedError('render_to_list() should be implemented by '
-                                  'all statements')
+    @property
+    def parent(self) -> Optional[Renderable]:
+        """
+        The parent is only weakly referenced so that trees have no reference
+        cycles and are freed as soon as the root is released. Keep a
+        reference to the root while building.
+        """
+        ref = self._parent_ref
+        return ref() if ref is not None else None
+
+    @parent.setter
+    def parent(self, parent: Optional[Renderable]):
+        self._parent_ref = weakref.ref(parent) if parent is not None \
+            else None
+
+    def live_parent(self) -> Optional[Renderable]:
+        """
+        The parent, or None if there is none. Raises Py2PyException if the
+        parent was freed because nothing kept a reference to the root.
+        """
+        ref = self._parent_ref
+        if ref is None:
+            return None
+        parent = ref()
+        if parent is None:
+            raise Py2PyException(f'The parent of this {type(self).__name__} '
+                                 f'was freed, keep a reference to the root '
+                                 f'of the tree while building it')
+        return parent
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self.weak_attributes:
+            if name in state:
+                state[name] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
 
-    def render(self, indent_level: int = 0) -> str:
+    def render_to_list(self, render_list: RenderList, indent_level: int):
+        if self.iter_render is None:
+            raise NotImplementedError('render_to_list() or iter_render() '
+                                      'should be implemented by all '
+                                      'statements')
+        render_tree(self, render_list, indent_level)
+
+    def render(self, indent_level: int = 0,
+               workers: Optional[int] = None) -> str:
+        """
+        With workers, the statements directly below this one are rendered
+        in that many worker processes, see parallel.render()
+        """
+        if workers is not None and self.iter_render is not None:
+            from .. import parallel
+            return parallel.render(self, [], indent_level, workers)
+        return ''.join(self.render_fragments(indent_level=indent_level))
+
+    def render_fragments(self, indent_level: int = 0) -> RenderList:
         render_list = []
         self.render_to_list(render_list, indent_level=indent_level)
-        return ''.join(render_list)
+        return render_list
+
+    def iter_render_steps(self, render_list: RenderList, indent_level: int):
+        """
+        render_to_list() one node at a time, yielding after every node that
+        was rendered, see streaming.iter_chunks()
+        """
+        if self.iter_render is None:
+            self.render_to_list(render_list, indent_level)
+            return iter(())
+        return iter_render_generator(self.iter_render(render_list,
+                                                      indent_level),
+                                     render_list)
+
+    def render_chunks(self, chunk_size: Optional[int] = None,
+                      indent_level: int = 0):
+        """
+        Yield the rendering in chunks of at most chunk_size characters, see
+        streaming.iter_chunks()
+        """
+        from .. import streaming
+        return streaming.iter_chunks(self, [], indent_level,
+                                     chunk_size or streaming.CHUNK_SIZE)
+
+    def arender(self, chunk_size: Optional[int] = None,
+                encoding: Optional[str] = None, indent_level: int = 0):
+        """
+        Async generator of the rendering in chunks, for use with async for.
+        Control returns to the event loop after every chunk.
+        """
+        from .. import streaming
+        return streaming.arender(self, [], indent_level,
+                                 chunk_size or streaming.CHUNK_SIZE, encoding)
+
+    def symbol_names(self) -> List[str]:
+        """
+        The names this statement binds in its scope
+        """
+        return []
 
     def set_parent(self, parent: Optional[Renderable]):
-        self.parent = parent
+        if not self.shared:
+            self.parent = parent
 
     def __enter__(self):
         return self
@@ -54,29 +162,54 @@ class SimpleStatement(Renderable):
         super().__init__()
 
     def render_to_list(self, render_list, indent_level):
-        return render_list.append(
-            do_indent(self.text.strip(), indent_level)
-        )
+        render_list.append(do_indent(self.text.strip(), indent_level))
+        render_list.append(BLOCK_STATEMENT_EOS)
 
 
 class Clause(Renderable):
     def __init__(self, keyword: str, parent: Renderable,
-                 content: str = '', proxy_methods=None,
+                 content: str = '', proxy_methods=(),
                  decorators: Optional[List[str]] = None,):
+        """
+        proxy_methods names methods of parent that can also be called on the
+        clause and its suite, e.g. elif_ on an "if" clause
+        """
         self.decorators: Optional[List[str]] = decorators or []
-        self.header = ClauseHeader(keyword, content=content)
-        self.suite = Suite(proxy_methods=proxy_methods)
-        self.proxy_methods = proxy_methods or {}
+        if INTERN_LEAVES:
+            self._header = intern_leaf(ClauseHeader, keyword, content)
+        else:
+            self._header = ClauseHeader(keyword, content=content)
+        self.proxy_methods = frozenset(proxy_methods)
+        self.suite = Suite(proxy_methods=self.proxy_methods, proxy_owner=self)
         super().__init__(parent)
-        
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.suite.set_proxy_owner(self)
+
+    @property
+    def header(self) -> ClauseHeader:
+        """
+        An interned header is copied on access, as the caller may change it
+        """
+        if self._header.shared:
+            self._header = copy.copy(self._header)
+            self._header.shared = False
+        return self._header
+
+    @header.setter
+    def header(self, header: ClauseHeader):
+        self._header = header
+
     def __getattr__(self, item):
-        attr = self.proxy_methods.get(item)
-        if attr:
-            return attr
+        if item.startswith('__'):
+            raise AttributeError(item)
+        if item in self.__dict__.get('proxy_methods', ()):
+            return getattr(self.live_parent(), item)
         return getattr(self.suite, item)
 
     def dedent(self):
-        return self.parent
+        return self.live_parent()
 
     def write(self, statement: Renderable):
         return self.suite.write(statement)
@@ -89,13 +222,13 @@ class Clause(Renderable):
         prefix = '@' if d[0] != '@' else ''
         return f'{prefix}{d}\n'
 
-    def render_to_list(self, render_list, indent_level):
+    def iter_render(self, render_list, indent_level):
         for d in self.decorators:
             render_list.append(
                 do_indent(self.render_decorator(d), indent_level)
             )
-        self.header.render_to_list(render_list, indent_level)
-        self.suite.render_to_list(render_list, indent_level+1)
+        self._header.render_to_list(render_list, indent_level)
+        yield self.suite, indent_level+1
 
 
 class ClauseHeader(Renderable):
@@ -107,6 +240,8 @@ class ClauseHeader(Renderable):
 
     def set_content(self, content: str):
         self.content = ' ' + content if content else ''
+        if INTERN_LEAVES:
+            self.content = sys.intern(self.content)
 
     def render_to_list(self, render_list, indent_level):
         return render_list.append(
@@ -120,7 +255,17 @@ class CompoundStatement(Renderable):
         super().__init__()
 
     def dedent(self):
-        return self.parent
+        return self.live_parent()
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        for value in state.values():
+            if isinstance(value, Clause):
+                value.set_parent(self)
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, Clause):
+                        item.set_parent(self)
 
     def get_clause(self) -> Clause:
         raise NotImplementedError('Every CompoundStatement must implement '
@@ -131,25 +276,42 @@ class CompoundStatement(Renderable):
             return getattr(self.get_clause(), item)
         raise AttributeError(item)
 
-    def render_to_list(self, render_list, indent_level):
-        raise NotImplementedError('render_to_list() should be implemented by '
-                                  'all compound statements')
-
 
 class Suite(Renderable):
+    weak_attributes = Renderable.weak_attributes + ('_proxy_owner_ref',)
+    symbols: Optional[SymbolTable] = None  # set for module and class bodies
+
     def __init__(self, pass_if_empty: bool = True,
-                 proxy_methods=None):
+                 proxy_methods=(), proxy_owner: Optional[Renderable] = None):
         self.statements = []
         self.pass_if_empty = pass_if_empty
-        self.proxy_methods = proxy_methods
+        self.proxy_methods = frozenset(proxy_methods)
+        self._proxy_owner_ref = None
+        self.set_proxy_owner(proxy_owner)
         super().__init__()
 
+    def set_proxy_owner(self, proxy_owner: Optional[Renderable]):
+        self._proxy_owner_ref = weakref.ref(proxy_owner) \
+            if proxy_owner is not None else None
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        for statement in self.statements:
+            statement.set_parent(self)
+
     def __getattr__(self, item):
-        if self.proxy_methods:
-            try:
-                return self.proxy_methods[item]
-            except KeyError:
-                pass
+        if item.startswith('__'):
+            raise AttributeError(item)
+        proxy_owner_ref = self.__dict__.get('_proxy_owner_ref')
+        if item in self.__dict__.get('proxy_methods', ()) and \
+                proxy_owner_ref is not None:
+            proxy_owner = proxy_owner_ref()
+            if proxy_owner is None:
+                raise Py2PyException(f'The owner of this suite was freed '
+                                     f'before calling {item}(), keep a '
+                                     f'reference to the root of the tree '
+                                     f'while building it')
+            return getattr(proxy_owner, item)
         raise AttributeError(item)
 
     def write(self, statement: Renderable):
@@ -158,18 +320,27 @@ class Suite(Renderable):
 
     def add(self, statement: Union[str, Renderable]):
         if isinstance(statement, str):
-            statement = SimpleStatement(statement)
+            if INTERN_LEAVES:
+                statement = intern_leaf(SimpleStatement, statement.strip())
+            else:
+                statement = SimpleStatement(statement)
 
+        if self.symbols is not None:
+            self.symbols.add(statement)
         self.statements.append(statement)
         statement.set_parent(self)
         return statement
 
     def clear(self):
+        if self.symbols is not None:
+            for statement in self.statements:
+                self.symbols.discard(statement)
         self.statements = []
 
     def dedent(self):
-        if self.parent:
-            return self.parent
+        parent = self.live_parent()
+        if parent:
+            return parent
         else:
             return self  # FIXME should this raise exception?
 
@@ -186,10 +357,24 @@ class Suite(Renderable):
         self.add(statement)
         return statement
 
+    def compact_(self) -> compact.CompactTree:
+        from .compact import CompactTree
+        statement = CompactTree()
+        self.add(statement)
+        return statement
+
     def def_(self, name, parameter_list=None,
-             decorators=None) -> statements.DefStatement:
+             decorators=None, return_type=None) -> statements.DefStatement:
         from .statements import DefStatement
-        statement = DefStatement(name, parameter_list, decorators)
+        statement = DefStatement(name, parameter_list, decorators,
+                                 return_type)
+        self.add(statement)
+        return statement
+
+    def dispatch_table_(self, name,
+                        parameter_list=None) -> statements.DispatchTable:
+        from .statements import DispatchTable
+        statement = DispatchTable(name, parameter_list)
         self.add(statement)
         return statement
 
@@ -205,6 +390,25 @@ class Suite(Renderable):
         self.add(statement)
         return statement
 
+    def match_(self, subject) -> statements.MatchStatement:
+        from .statements import MatchStatement
+        statement = MatchStatement(subject)
+        self.add(statement)
+        return statement
+
+    def numeric_array_(self, name, values, typecode=None,
+                       sidecar=None) -> statements.NumericArray:
+        from .statements import NumericArray
+        statement = NumericArray(name, values, typecode, sidecar)
+        self.add(statement)
+        return statement
+
+    def region_(self, name) -> statements.Region:
+        from .statements import Region
+        statement = Region(name)
+        self.add(statement)
+        return statement
+
     def try_(self) -> statements.TryStatement:
         from .statements import TryStatement
         statement = TryStatement()
@@ -223,13 +427,95 @@ class Suite(Renderable):
         self.add(statement)
         return statement
 
-    def render_to_list(self, render_list, indent_level):
+    def iter_render(self, render_list, indent_level):
         if not self.statements and self.pass_if_empty:
             # no statements, automatically add pass
-            self.write(SimpleStatement('pass'))
+            if INTERN_LEAVES:
+                self.write(intern_leaf(SimpleStatement, 'pass'))
+            else:
+                self.write(SimpleStatement('pass'))
 
         for statement in self.statements:
-            statement.render_to_list(render_list, indent_level)
+            yield statement, indent_level
+
+
+# entries go away with the last tree using them
+_leaf_cache: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+
+def intern_leaf(cls, *args) -> Renderable:
+    """
+    Return the shared instance of cls(*args), creating it on first use.
+
+    Only use this for leaves that are not modified after creation. Shared
+    leaves do not track a parent.
+    """
+    key = (cls,) + args
+    leaf = _leaf_cache.get(key)
+    if leaf is None:
+        leaf = cls(*args)
+        leaf.shared = True
+        leaf.parent = None
+        _leaf_cache[key] = leaf
+    return leaf
+
+
+def clear_interned_leaves():
+    _leaf_cache.clear()
+
+
+def render_tree(node: Renderable, render_list: RenderList,
+                indent_level: int):
+    """
+    Render node and all its descendants without recursion.
+
+    Nodes with children implement iter_render(), a generator that appends
+    its own text to render_list and yields (child, indent_level) for each
+    child. The child is rendered before the generator is resumed, so the
+    depth of the tree is limited only by memory. Leaves just implement
+    render_to_list().
+    """
+    render_generator(node.iter_render(render_list, indent_level), render_list)
+
+
+def render_generator(generator, render_list: RenderList):
+    """
+    Run an iter_render() generator to completion, see render_tree()
+    """
+    deque(iter_render_generator(generator, render_list), maxlen=0)
+
+
+def iter_render_generator(generator, render_list: RenderList):
+    """
+    render_generator() that yields after every node it renders, so the text
+    rendered so far can be handed out before the rest of the tree is done
+    """
+    stack = [generator]
+    while stack:
+        for child, child_indent in stack[-1]:
+            if child.iter_render is None:
+                child.render_to_list(render_list, child_indent)
+                yield
+            else:
+                stack.append(child.iter_render(render_list, child_indent))
+                break
+        else:
+            stack.pop()
+        yield
+
+
+def walk(node: Renderable):
+    """
+    Yield node and every statement, clause and header below it
+    """
+    pending = [node]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, Renderable):
+            yield value
+            pending.extend(reversed(list(vars(value).values())))
+        elif isinstance(value, (list, tuple)):
+            pending.extend(reversed(value))
 
 
 def do_indent(text: str, indent_level: int):
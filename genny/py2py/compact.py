@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+from array import array
+from typing import Dict, List, Union
+
+from . import base
+from .base import Py2PyException, Renderable
+from .statements import Assign, render_parameter
+from .. import regions
+
+# node kinds
+LINE = 0  # a simple statement, indented
+OBJECT = 1  # a statement object, the text indexes the objects list
+CLAUSE = 2  # header followed by ':' and the children one level deeper
+GROUP = 3  # the children at the same level, then the text as is
+REGION = 4  # the children between region markers named by the text
+
+NO_NODE = -1
+
+# the clauses that may come directly before a clause of this keyword
+_FOLLOWS = {
+    'elif': ('if', 'elif'),
+    'else': ('if', 'elif', 'for', 'while', 'except'),
+    'except': ('try', 'except'),
+    'finally': ('try', 'except', 'else'),
+}
+
+
+class CompactTree(Renderable):
+    """
+    A statement tree kept in typed arrays instead of one object per node.
+
+    Every node is an index into parallel arrays holding its kind, the index
+    of its text in an interned string table and its links to its parent,
+    first and last child and next sibling. Builder methods (add, def_,
+    if_ ...) mirror those of Suite and return light CompactNode handles
+    for the nodes they create. The tree is itself a statement that can be
+    added to any suite, e.g. through Suite.compact_().
+
+    Statement objects passed to add() are kept as they are and rendered in
+    place. Dispatch tables and with statements of several items can only be
+    added that way.
+    """
+    def __init__(self):
+        super().__init__()
+        self.kinds = array('B')
+        self.texts = array('I')
+        self.parents = array('i')
+        self.first_children = array('i')
+        self.last_children = array('i')
+        self.next_siblings = array('i')
+        self.strings: List[str] = []
+        self.string_index: Dict[str, int] = {}
+        self.objects: List[Renderable] = []
+        self.new_node(GROUP, '', NO_NODE)  # the root
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def intern(self, text: str) -> int:
+        index = self.string_index.get(text)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(text)
+            self.string_index[text] = index
+        return index
+
+    def new_node(self, kind: int, text: Union[str, Renderable],
+                 parent: int) -> int:
+        node = len(self.kinds)
+        self.kinds.append(kind)
+        if kind == OBJECT:
+            self.texts.append(len(self.objects))
+            self.objects.append(text)
+            text.set_parent(self)
+        else:
+            self.texts.append(self.intern(text))
+        self.parents.append(parent)
+        self.first_children.append(NO_NODE)
+        self.last_children.append(NO_NODE)
+        self.next_siblings.append(NO_NODE)
+        if parent != NO_NODE:
+            last = self.last_children[parent]
+            if last == NO_NODE:
+                self.first_children[parent] = node
+            else:
+                self.next_siblings[last] = node
+            self.last_children[parent] = node
+        return node
+
+    def text(self, node: int) -> str:
+        return self.strings[self.texts[node]]
+
+    def children(self, node: int) -> List[int]:
+        children = []
+        child = self.first_children[node]
+        while child != NO_NODE:
+            children.append(child)
+            child = self.next_siblings[child]
+        return children
+
+    @property
+    def root(self) -> CompactNode:
+        return CompactNode(self, 0)
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        for statement in self.objects:
+            statement.set_parent(self)
+
+    def __getattr__(self, item):
+        # builder methods act on the root
+        if item.startswith('_') or item not in _BUILDER_METHODS:
+            raise AttributeError(item)
+        return getattr(self.root, item)
+
+    def only_empty_regions(self, node: int) -> bool:
+        """
+        True if the children of node are regions without statements, which
+        leave a clause empty
+        """
+        pending = self.children(node)
+        while pending:
+            child = pending.pop()
+            if self.kinds[child] != REGION:
+                return False
+            pending.extend(self.children(child))
+        return True
+
+    def render_to_list(self, render_list, indent_level):
+        kinds = self.kinds
+        texts = self.texts
+        first_children = self.first_children
+        next_siblings = self.next_siblings
+        strings = self.strings
+        objects = self.objects
+        append = render_list.append
+        eos = base.BLOCK_STATEMENT_EOS
+        indents = [base.INDENT * indent_level]
+        stack = []  # (node to close or NO_NODE, next node, depth)
+        depth = 0
+        node = first_children[0]
+        while True:
+            if node == NO_NODE:
+                if not stack:
+                    break
+                closing, node, depth = stack.pop()
+                if closing != NO_NODE:
+                    text = strings[texts[closing]]
+                    if kinds[closing] == REGION:
+                        append(indents[depth] +
+                               regions.end_marker('#', text) + eos)
+                    elif text:
+                        append(text)
+                continue
+            kind = kinds[node]
+            if kind == LINE:
+                text = strings[texts[node]]
+                append(indents[depth] + text + eos if text else eos)
+                node = next_siblings[node]
+            elif kind == OBJECT:
+                objects[texts[node]].render_to_list(render_list,
+                                                    indent_level + depth)
+                node = next_siblings[node]
+            elif kind == CLAUSE:
+                append(indents[depth] + strings[texts[node]] + ':' + eos)
+                if depth + 1 == len(indents):
+                    indents.append(indents[-1] + base.INDENT)
+                child = first_children[node]
+                if child == NO_NODE or kinds[child] == REGION and \
+                        self.only_empty_regions(node):
+                    append(indents[depth + 1] + 'pass' + eos)
+                if child == NO_NODE:
+                    node = next_siblings[node]
+                else:
+                    stack.append((NO_NODE, next_siblings[node], depth))
+                    node = child
+                    depth += 1
+            else:
+                if kind == REGION:
+                    append(indents[depth] + regions.begin_marker(
+                        '#', strings[texts[node]]) + eos)
+                stack.append((node, next_siblings[node], depth))
+                node = first_children[node]
+
+
+class CompactNode:
+    """
+    Handle of a node of a CompactTree. New statements go into the node, or
+    for a match statement into its last case; owner is the node of the
+    compound statement a clause belongs to.
+    """
+    def __init__(self, tree: CompactTree, node: int, owner: int = NO_NODE):
+        self.tree = tree
+        self.node = node
+        self.owner = owner
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def _suite(self) -> int:
+        tree = self.tree
+        if tree.kinds[self.node] == CLAUSE and self.owner == NO_NODE:
+            # a match statement, statements go into its last case
+            last = tree.last_children[self.node]
+            if last == NO_NODE:
+                raise Py2PyException('"match" statement has no "case" '
+                                     'clause')
+            return last
+        return self.node
+
+    def _statement_keyword(self) -> str:
+        """
+        The keyword of the first clause of the compound statement
+        """
+        tree = self.tree
+        first = next(child for child in tree.children(self.owner)
+                     if tree.kinds[child] == CLAUSE)
+        return tree.text(first).split(' ', 1)[0]
+
+    def dedent(self) -> CompactNode:
+        """
+        Return the handle of the block holding this statement
+        """
+        tree = self.tree
+        node = self.owner if self.owner != NO_NODE else self.node
+        parent = tree.parents[node]
+        while parent > 0 and tree.kinds[parent] == GROUP:
+            parent = tree.parents[parent]
+        if parent == NO_NODE:
+            return self
+        if tree.kinds[parent] == CLAUSE:
+            return CompactNode(tree, parent, tree.parents[parent])
+        return CompactNode(tree, parent)
+
+    def add(self, statement: Union[str, Renderable]) -> CompactNode:
+        tree = self.tree
+        parent = self._suite()
+        if isinstance(statement, str):
+            node = tree.new_node(LINE, statement.strip(), parent)
+        else:
+            node = tree.new_node(OBJECT, statement, parent)
+        return CompactNode(tree, node)
+
+    def write(self, statement: Union[str, Renderable]) -> CompactNode:
+        self.add(statement)
+        return self
+
+    def _compound(self, header: str, decorators=None,
+                  closing: str = '') -> CompactNode:
+        tree = self.tree
+        group = tree.new_node(GROUP, closing, self._suite())
+        for d in decorators or []:
+            tree.new_node(LINE, d if d[0] == '@' else '@' + d, group)
+        return CompactNode(tree, tree.new_node(CLAUSE, header, group), group)
+
+    def _clause(self, keyword: str, content: str = '') -> CompactNode:
+        tree = self.tree
+        if self.owner == NO_NODE:
+            raise Py2PyException(f'"{keyword}" clause outside a compound '
+                                 f'statement')
+        last = tree.text(tree.last_children[self.owner]).split(' ', 1)[0]
+        if last not in _FOLLOWS[keyword] or \
+                keyword == 'finally' and self._statement_keyword() != 'try':
+            raise Py2PyException(f'"{keyword}" clause cannot follow '
+                                 f'"{last}" clause')
+        header = f'{keyword} {content}' if content else keyword
+        return CompactNode(tree, tree.new_node(CLAUSE, header, self.owner),
+                           self.owner)
+
+    def call_(self, function_name, *args, **kwargs) -> CompactNode:
+        from .statements import FunctionCall
+        return self.add(FunctionCall(function_name, *args, **kwargs))
+
+    def class_(self, name, bases=None, decorators=None) -> CompactNode:
+        base_part = '({})'.format(','.join(bases)) if bases else ''
+        return self._compound(f'class {name}{base_part}', decorators,
+                              base.BLOCK_STATEMENT_EOS * 2)
+
+    def def_(self, name, parameter_list=None, decorators=None,
+             return_type=None) -> CompactNode:
+        params = ', '.join([render_parameter(x)
+                            for x in parameter_list or []])
+        header = f'def {name}({params})'
+        if return_type:
+            header += f' -> {return_type}'
+        return self._compound(header, decorators)
+
+    def for_(self, target_list, in_) -> CompactNode:
+        return self._compound(f'for {target_list} in {in_}')
+
+    def if_(self, expression) -> CompactNode:
+        return self._compound(f'if {expression}')
+
+    def match_(self, subject) -> CompactNode:
+        node = self._compound(f'match {subject}')
+        return CompactNode(self.tree, node.node)
+
+    def region_(self, name) -> CompactNode:
+        tree = self.tree
+        return CompactNode(tree, tree.new_node(REGION, name, self._suite()))
+
+    def try_(self) -> CompactNode:
+        return self._compound('try')
+
+    def while_(self, expression) -> CompactNode:
+        return self._compound(f'while {expression}')
+
+    def with_(self, expression, as_=None) -> CompactNode:
+        return self._compound(f'with {expression} as {as_}' if as_
+                              else f'with {expression}')
+
+    def elif_(self, expression) -> CompactNode:
+        return self._clause('elif', expression)
+
+    def else_(self) -> CompactNode:
+        return self._clause('else')
+
+    def except_(self, expression) -> CompactNode:
+        return self._clause('except', expression)
+
+    def finally_(self) -> CompactNode:
+        return self._clause('finally')
+
+    def case_(self, pattern) -> CompactNode:
+        tree = self.tree
+        match = self.node if self.owner == NO_NODE else self.owner
+        if tree.kinds[match] != CLAUSE or \
+                not tree.text(match).startswith('match '):
+            raise Py2PyException('"case" clause outside a "match" statement')
+        last = tree.last_children[match]
+        if last != NO_NODE and tree.text(last) == 'case _':
+            raise Py2PyException('"case _" must be the last clause of '
+                                 '"match" statement')
+        return CompactNode(tree, tree.new_node(CLAUSE, f'case {pattern}',
+                                               match), match)
+
+    def default_(self) -> CompactNode:
+        return self.case_('_')
+
+    def add_attribute(self, name, type_hint, value=None) -> CompactNode:
+        return self.add(Assign(name, value, type_hint))
+
+    def add_method(self, name, parameter_list=None, decorators=None,
+                   return_type=None) -> CompactNode:
+        return self.def_(name, ['self'] + list(parameter_list or []),
+                         decorators, return_type)
+
+    def add_class_method(self, name, parameter_list=None, decorators=None,
+                         return_type=None) -> CompactNode:
+        return self.def_(name, ['cls'] + list(parameter_list or []),
+                         list(decorators or []) + ['classmethod'],
+                         return_type)
+
+    def add_static_method(self, name, parameter_list=None, decorators=None,
+                          return_type=None) -> CompactNode:
+        return self.def_(name, parameter_list,
+                         list(decorators or []) + ['staticmethod'],
+                         return_type)
+
+
+_BUILDER_METHODS = frozenset(
+    name for name in vars(CompactNode)
+    if not name.startswith('_') and name not in ('tree', 'node', 'owner'))
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import importlib
+import importlib.abc
+import importlib.util
+import sys
+from collections import OrderedDict
+from types import CodeType, ModuleType
+from typing import Dict, Optional, Tuple
+
+from .base import Py2PyException
+
+# file names given to in-memory modules; not bracketed, so that linecache
+# asks the loader for the source of tracebacks
+FILE_PREFIX = 'genny-memory'
+
+CODE_CACHE_SIZE = 1024  # compiled modules kept, least recently used dropped
+
+_code_cache: OrderedDict = OrderedDict()  # (file name, hash) -> code
+
+
+def compile_cached(source: str, file_name: str) -> CodeType:
+    """
+    Compile module source, reusing the code object of an earlier call with
+    the same file name and source
+    """
+    key = (file_name, hashlib.sha256(source.encode('utf-8')).digest())
+    code = _code_cache.get(key)
+    if code is not None:
+        _code_cache.move_to_end(key)
+        return code
+    code = compile(source, file_name, 'exec', dont_inherit=True)
+    _code_cache[key] = code
+    if len(_code_cache) > CODE_CACHE_SIZE:
+        _code_cache.popitem(last=False)
+    return code
+
+
+def clear_code_cache():
+    _code_cache.clear()
+
+
+class MemoryImporter(importlib.abc.MetaPathFinder,
+                     importlib.abc.InspectLoader):
+    """
+    Finder and loader for modules whose source is held in memory, so that
+    generated modules can be imported without saving them.
+
+    Add modules with add_source(), Module.add_to_importer() or
+    Package.add_to_importer(), then import them as usual once the importer
+    is installed on sys.meta_path (install(), or use it as a context
+    manager). Code objects are shared through compile_cached().
+    """
+    def __init__(self):
+        # module name -> (source, is package)
+        self.sources: Dict[str, Tuple[str, bool]] = {}
+
+    def add_source(self, fullname: str, source: str,
+                   is_package: bool = False):
+        self.sources[fullname] = (source, is_package)
+        # a module imported before has to be imported again
+        sys.modules.pop(fullname, None)
+
+    def remove(self, fullname: str):
+        self.sources.pop(fullname, None)
+        sys.modules.pop(fullname, None)
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+        for fullname in self.sources:
+            sys.modules.pop(fullname, None)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.uninstall()
+
+    def import_module(self, fullname: str) -> ModuleType:
+        self.install()
+        return importlib.import_module(fullname)
+
+    # MetaPathFinder
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname not in self.sources:
+            return None
+        is_package = self.sources[fullname][1]
+        spec = importlib.util.spec_from_loader(
+            fullname, self, origin=self.get_filename(fullname),
+            is_package=is_package)
+        spec.has_location = True  # sets __file__, for tracebacks
+        return spec
+
+    # InspectLoader
+
+    def get_filename(self, fullname: str) -> str:
+        path = fullname.replace('.', '/')
+        if self.sources[fullname][1]:
+            path += '/__init__'
+        return f'{FILE_PREFIX}/{path}.py'
+
+    def is_package(self, fullname: str) -> bool:
+        if fullname not in self.sources:
+            raise ImportError(f'No module named {fullname!r}', name=fullname)
+        return self.sources[fullname][1]
+
+    def get_source(self, fullname: str) -> str:
+        if fullname not in self.sources:
+            raise ImportError(f'No module named {fullname!r}', name=fullname)
+        return self.sources[fullname][0]
+
+    def get_code(self, fullname: str) -> CodeType:
+        return compile_cached(self.get_source(fullname),
+                              self.get_filename(fullname))
+
+
+_default_importer: Optional[MemoryImporter] = None
+
+
+def default_importer() -> MemoryImporter:
+    """
+    The importer used by Module.load() and Package.load(), installed on
+    first use
+    """
+    global _default_importer
+    if _default_importer is None:
+        _default_importer = MemoryImporter()
+    return _default_importer.install()
+
+
+def check_loadable(module):
+    if module.sidecar_arrays():
+        raise Py2PyException(f'Module "{module.name}" has numeric arrays in '
+                             f'sidecar files, which cannot be loaded from '
+                             f'memory')
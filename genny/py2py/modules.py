@@ -1,27 +1,124 @@
-from .base import Suite
+from .base import Py2PyException, Suite
 from . import base
+from .. import regions, telemetry, writers
+from ..symbols import SymbolTable
+import ast
+import importlib.util
+import marshal
 import os
+import re
+import string
+
+IDENTIFIER = re.compile(r'[A-Za-z_]\w*')
+
+LAZY_IMPORT_HELPER = '''\
+import importlib.util as _importlib_util
+import sys as _sys
+
+
+def _lazy_import(name):
+    if name in _sys.modules:
+        return _sys.modules[name]
+    spec = _importlib_util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    loader = _importlib_util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = _importlib_util.module_from_spec(spec)
+    _sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+'''
+
+# a string.Template, as the code has braces of its own
+LAZY_SUBMODULES_LOADER = string.Template('''\
+_LAZY_SUBMODULES = frozenset($submodules)
+
+
+def __getattr__(name):
+    if name in _LAZY_SUBMODULES:
+        import importlib
+        module = importlib.import_module('.' + name, __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | _LAZY_SUBMODULES)
+''')
 
 
 class Module(Suite):
-    def __init__(self, name, sort_imports=True):
+    def __init__(self, name, sort_imports=True, prune_imports=False):
+        """
+        With prune_imports, imported names that the rendered module body
+        does not mention are left out, see prune_unused_imports(). The
+        imports of a package __init__ module are kept, as they are usually
+        there to be re-exported.
+        """
         super(Module, self).__init__()
         self.name = name
         self.sort_imports = sort_imports
+        self.prune_imports = prune_imports
         self.imports = set()
+        self.kept_imports = set()  # never pruned, e.g. for side effects
+        self.lazy_imports = set()  # loaded on first attribute access
+        self.lazy_submodules = []  # for package __init__ modules
         self.shebang_str = None
         self.encoding = None
+        self.symbols = SymbolTable(Py2PyException)
+
+    def lookup(self, qualified_name):
+        """
+        Return the module level statement (or class member, for names like
+        "Class.method") that binds qualified_name last, or None
+        """
+        return self.symbols.lookup(qualified_name)
+
+    def duplicates(self):
+        """
+        Return the names of module level definitions made more than once
+        """
+        return self.symbols.duplicates()
 
-    def add_import(self, expr):
+    def add_import(self, expr, keep=False, lazy=False):
+        """
+        With lazy, the module is bound to a importlib.util.LazyLoader module
+        that is only executed on first attribute access. Only "import x" and
+        "import x.y as z" forms can be lazy.
+        """
         if expr.startswith('import ') or expr.startswith('from '):
             import_expr = expr
         else:
             import_expr = 'import ' + expr
         if not import_expr.endswith('\n'):
             import_expr += '\n'
-        self.imports.add(import_expr)
+        if lazy:
+            _lazy_import_target(import_expr)  # validate
+            self.lazy_imports.add(import_expr)
+        else:
+            self.imports.add(import_expr)
+        if keep:
+            self.kept_imports.add(import_expr)
         return self
 
+    def get_imports(self, body_text=None, lazy=False):
+        """
+        Return the import statements (or the lazy ones) to render, pruned
+        against body_text if prune_imports is set
+        """
+        imports = self.lazy_imports if lazy else self.imports
+        if self.prune_imports and body_text is not None and \
+                self.name != '__init__':
+            imports = prune_unused_imports(imports, body_text,
+                                           self.kept_imports)
+        if self.sort_imports:
+            return sorted(imports)
+        return list(imports)
+
     def set_shebang(self, shebang_str=''):
         if shebang_str:
             if not shebang_str.startswith('#!'):
@@ -36,21 +133,263 @@ class Module(Suite):
         self.encoding = f'# -*- coding: {encoding} -*-\n'
         return self
 
-    def render_to_list(self, render_list, indent_level):
+    def iter_render(self, render_list, indent_level):
         if self.shebang_str:
             render_list.append(self.shebang_str)
         if self.encoding:
             render_list.append(self.encoding)
 
-        if self.sort_imports:
-            self.imports = sorted(self.imports)
-        render_list.extend(self.imports)
-        if self.imports:
+        if not self.prune_imports:
+            self.render_imports(render_list)
+            yield from super().iter_render(render_list, indent_level)
+        else:
+            # the body has to be rendered before the imports can be chosen
+            body = []
+            base.render_generator(super().iter_render(body, indent_level),
+                                  body)
+            self.render_imports(render_list, ''.join(body))
+            render_list.extend(body)
+
+        if self.lazy_submodules:
+            render_list.append(base.BLOCK_STATEMENT_EOS)
+            render_list.append(LAZY_SUBMODULES_LOADER.substitute(
+                submodules=repr(sorted(self.lazy_submodules))))
+
+    def render_imports(self, render_list, body_text=None):
+        imports = self.get_imports(body_text)
+        render_list.extend(imports)
+        if imports:
             render_list.append(base.BLOCK_STATEMENT_EOS)
+        render_lazy_imports(render_list,
+                            self.get_imports(body_text, lazy=True))
+
+    def render_stub(self):
+        from .stubs import render_stub
+        return render_stub(self)
 
-        super().render_to_list(render_list, indent_level=indent_level)
+    def save(self, dir_name, vectored=False, update_regions=False,
+             stubs=False, max_lines=None, max_bytes=None, listener=None):
+        """
+        With update_regions, an existing file only has its generated regions
+        (see Suite.region_()) replaced and is left untouched if none changed.
+        With stubs, a matching .pyi stub is written next to the module.
+        A module larger than max_lines or max_bytes is saved as a package of
+        the same name, see splitting.split_module().
+        The listener (a telemetry.SaveListener) is told about every file
+        written.
+        """
+        with telemetry.run(listener):
+            self._save(dir_name, vectored, update_regions, stubs, max_lines,
+                       max_bytes, listener)
 
-    def save(self, dir_name):
+    def _save(self, dir_name, vectored, update_regions, stubs, max_lines,
+              max_bytes, listener):
+        if max_lines is not None or max_bytes is not None:
+            if self.save_split(dir_name, max_lines, max_bytes, stubs,
+                               listener):
+                return
         file_name = os.path.join(dir_name, self.name + '.py')
-        with open(file_name, 'w') as f:
-            f.write(self.render())
+        self.save_sidecars(dir_name)
+        if stubs:
+            writers.write_platform_text(
+                os.path.join(dir_name, self.name + '.pyi'), self.render_stub(),
+                encoding='utf-8')
+        stats = None
+        if listener is not None:
+            stats = telemetry.FileStats(file_name)
+            stats.node_count = telemetry.count_nodes(self, base.Renderable)
+        if update_regions and os.path.exists(file_name):
+            text = telemetry.time_render(stats, self.render)
+            start = telemetry.clock()
+            changed = regions.update_regions(file_name, text, '#')
+            if stats is not None:
+                stats.write_time = telemetry.clock() - start
+                if changed:
+                    stats.bytes_written = os.path.getsize(file_name)
+        elif vectored:
+            fragments = telemetry.time_render(stats, self.render_fragments)
+            writers.write_fragments(file_name, fragments, encoding='utf-8',
+                                    stats=stats)
+        else:
+            text = telemetry.time_render(stats, self.render)
+            writers.write_platform_text(file_name, text, encoding='utf-8',
+                                        stats=stats)
+        if listener is not None:
+            listener.file_saved(stats)
+
+    def save_split(self, dir_name, max_lines=None, max_bytes=None,
+                   stubs=False, listener=None):
+        """
+        Save as a package of part modules if over budget. Returns False,
+        without writing anything, if the module is within budget.
+        """
+        from .splitting import split_module
+        if self.name == '__init__':
+            raise Py2PyException('A package __init__ module cannot be split')
+        start = telemetry.clock()
+        sources = split_module(self, max_lines, max_bytes)
+        render_time = telemetry.clock() - start
+        if sources is None:
+            return False
+        package_path = os.path.join(dir_name, self.name)
+        start = telemetry.clock()
+        os.makedirs(package_path, exist_ok=True)
+        if listener is not None:
+            listener.directory_created(package_path,
+                                       telemetry.clock() - start)
+        self.save_sidecars(package_path)
+        for name, source in sources.items():
+            file_name = os.path.join(package_path, name + '.py')
+            stats = None
+            if listener is not None:
+                stats = telemetry.FileStats(file_name)
+                if name == '__init__':
+                    # the parts are rendered together, the whole module is
+                    # accounted to its __init__
+                    stats.node_count = telemetry.count_nodes(self,
+                                                             base.Renderable)
+                    stats.render_time = render_time
+            writers.write_platform_text(file_name, source, encoding='utf-8',
+                                        stats=stats)
+            if listener is not None:
+                listener.file_saved(stats)
+        if stubs:
+            writers.write_platform_text(
+                os.path.join(package_path, '__init__.pyi'), self.render_stub(),
+                encoding='utf-8')
+        return True
+
+    def sidecar_arrays(self):
+        from .statements import NumericArray
+        return [statement for statement in base.walk(self)
+                if isinstance(statement, NumericArray) and statement.sidecar
+                and statement.values]
+
+    def save_sidecars(self, dir_name):
+        """
+        Write the data files of the numeric arrays kept out of the source
+        """
+        for statement in self.sidecar_arrays():
+            with open(os.path.join(dir_name, statement.sidecar), 'wb') as f:
+                f.write(statement.data())
+
+    def add_to_importer(self, importer, prefix=''):
+        """
+        Make the module importable as prefix + name through importer, an
+        importer.MemoryImporter
+        """
+        from .importer import check_loadable
+        check_loadable(self)
+        importer.add_source(prefix + self.name, self.render())
+
+    def load(self, importer=None):
+        """
+        Import the module from memory, without saving it. Returns the module
+        object; the default importer is used unless one is given.
+        """
+        from .importer import default_importer
+        if importer is None:
+            importer = default_importer()
+        self.add_to_importer(importer)
+        return importer.import_module(self.name)
+
+    def save_to_zip(self, zip_file, arc_dir='', compile_pyc=False):
+        if self.sidecar_arrays():
+            raise Py2PyException(f'Module "{self.name}" has numeric arrays '
+                                 f'in sidecar files, which cannot be '
+                                 f'memory-mapped from an archive')
+        arc_name = arc_dir + self.name + '.py'
+        source = self.render().encode('utf-8')
+        zip_file.writestr(arc_name, source)
+        if compile_pyc:
+            zip_file.writestr(arc_name + 'c', compile_to_pyc(source, arc_name))
+
+
+def compile_to_pyc(source, file_name):
+    """
+    Return the contents of an unchecked hash-based .pyc file for source.
+
+    zipimport does not need to compare timestamps against the .py member for
+    unchecked hash-based pycs, so the archive's own timestamps do not matter.
+    """
+    code = compile(source, file_name, 'exec', dont_inherit=True)
+    data = bytearray(importlib.util.MAGIC_NUMBER)
+    data.extend((0b01).to_bytes(4, 'little'))  # hash-based, unchecked
+    data.extend(importlib.util.source_hash(source))
+    data.extend(marshal.dumps(code))
+    return bytes(data)
+
+
+def render_lazy_imports(render_list, lazy_imports, stub=False):
+    """
+    Append lazy imports (see Module.add_import()) to render_list, bound
+    through the _lazy_import helper, or for a stub as the plain imports
+    type checkers understand
+    """
+    if not lazy_imports:
+        return
+    if stub:
+        render_list.extend(lazy_imports)
+    else:
+        render_list.append(LAZY_IMPORT_HELPER)
+        for import_expr in lazy_imports:
+            target, name = _lazy_import_target(import_expr)
+            render_list.append(f'{target} = _lazy_import({name!r})\n')
+    render_list.append(base.BLOCK_STATEMENT_EOS)
+
+
+def _lazy_import_target(import_expr):
+    """
+    Return the (bound name, module name) of a lazy import
+    """
+    try:
+        nodes = ast.parse(import_expr).body
+    except SyntaxError:
+        nodes = []
+    if len(nodes) != 1 or not isinstance(nodes[0], ast.Import) or \
+            len(nodes[0].names) != 1:
+        raise Py2PyException(f'Only "import x" can be lazy: {import_expr}')
+    alias = nodes[0].names[0]
+    if '.' in alias.name and not alias.asname:
+        raise Py2PyException(f'Lazy import of a submodule needs "as": '
+                             f'{import_expr}')
+    return alias.asname or alias.name, alias.name
+
+
+def _bound_name(alias, is_from):
+    if alias.asname:
+        return alias.asname
+    return alias.name if is_from else alias.name.split('.')[0]
+
+
+def prune_unused_imports(imports, body_text, kept_imports=()):
+    """
+    Return the import statements of imports whose names are mentioned in
+    body_text. Unused names are removed from multi-name imports. Any
+    identifier in body_text counts as a use, including ones in strings and
+    comments, so names are only dropped when they are certainly unused.
+    """
+    used = set(IDENTIFIER.findall(body_text))
+    pruned = []
+    for import_expr in imports:
+        try:
+            nodes = ast.parse(import_expr).body
+        except SyntaxError:
+            nodes = []
+        if import_expr in kept_imports or len(nodes) != 1:
+            pruned.append(import_expr)
+            continue
+        node = nodes[0]
+        is_from = isinstance(node, ast.ImportFrom)
+        if is_from and (node.module == '__future__' or
+                        any(alias.name == '*' for alias in node.names)):
+            pruned.append(import_expr)
+            continue
+        names = [alias for alias in node.names
+                 if _bound_name(alias, is_from) in used]
+        if len(names) == len(node.names):
+            pruned.append(import_expr)
+        elif names:
+            node.names = names
+            pruned.append(ast.unparse(node) + '\n')
+    return pruned
@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import ast
+import operator
+import re
+from typing import Callable, Iterable, List, Optional, Union
+
+from .base import Clause, Renderable, Suite, walk
+from .statements import Assign, IfStatement, WhileStatement
+
+# a rule returns None to keep the statement (possibly changed in place), or
+# the statement(s) that replace it
+RewriteResult = Optional[Union[Renderable, List[Renderable]]]
+RewriteRule = Callable[[Renderable, 'Optimizer'], RewriteResult]
+
+MAX_FOLDED_LEN = 256  # longest str/bytes a fold may produce
+MAX_FOLDED_BITS = 1024  # largest int a fold may produce
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.BitAnd: operator.and_,
+}
+
+_UNARY_OPS = {
+    ast.Not: operator.not_,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Invert: operator.invert,
+}
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+# statements that affect the enclosing function even in unreachable code
+_SCOPE_CHANGING = re.compile(r'\b(yield|global|nonlocal)\b')
+
+
+def _is_negative_literal(node):
+    """
+    True for a minus sign in front of a number, which stays as written
+    instead of counting as something to fold
+    """
+    return isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) \
+        and isinstance(node.operand, ast.Constant) \
+        and isinstance(node.operand.value, (int, float, complex)) \
+        and not isinstance(node.operand.value, bool)
+
+
+def _is_constant(node):
+    return isinstance(node, ast.Constant) or _is_negative_literal(node)
+
+
+def _value(node):
+    if _is_negative_literal(node):
+        return -node.operand.value
+    return node.value
+
+
+def _too_big(value):
+    if isinstance(value, (str, bytes)):
+        return len(value) > MAX_FOLDED_LEN
+    if isinstance(value, int):
+        return value.bit_length() > MAX_FOLDED_BITS
+    return False
+
+
+def _safe_to_compute(op, left, right):
+    """
+    Reject operations that could take a long time or a lot of memory before
+    their result can be checked
+    """
+    if isinstance(op, ast.Pow) and isinstance(right, (int, float)):
+        if isinstance(left, int) and isinstance(right, int):
+            return abs(right) * max(abs(left).bit_length(), 1) \
+                <= MAX_FOLDED_BITS
+        return abs(right) <= MAX_FOLDED_BITS
+    if isinstance(op, ast.LShift) and isinstance(right, int):
+        return right <= MAX_FOLDED_BITS
+    if isinstance(op, ast.Mult):
+        for seq, n in ((left, right), (right, left)):
+            if isinstance(seq, (str, bytes)) and isinstance(n, int):
+                return len(seq) * n <= MAX_FOLDED_LEN
+    return True
+
+
+class _ConstantFolder(ast.NodeTransformer):
+    def __init__(self):
+        self.changed = False
+
+    def _constant(self, value, node):
+        if _too_big(value):
+            return node
+        self.changed = True
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        op = _BIN_OPS.get(type(node.op))
+        if op is None or not (_is_constant(node.left) and
+                              _is_constant(node.right)):
+            return node
+        left, right = _value(node.left), _value(node.right)
+        if not _safe_to_compute(node.op, left, right):
+            return node
+        try:
+            return self._constant(op(left, right), node)
+        except Exception:
+            return node  # leave errors to runtime
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if not _is_constant(node.operand) or _is_negative_literal(node):
+            return node
+        try:
+            return self._constant(
+                _UNARY_OPS[type(node.op)](_value(node.operand)), node)
+        except Exception:
+            return node
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        is_and = isinstance(node.op, ast.And)
+        values = list(node.values)
+        # only leading constants can be dropped, later operands may have
+        # side effects
+        while len(values) > 1 and _is_constant(values[0]):
+            if bool(_value(values[0])) != is_and:
+                self.changed = True
+                return values[0]
+            values.pop(0)
+        if len(values) == len(node.values):
+            return node
+        self.changed = True
+        if len(values) == 1:
+            return values[0]
+        node.values = values
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        operands = [node.left] + node.comparators
+        if not all(_is_constant(x) for x in operands):
+            return node
+        try:
+            result = all(
+                _COMPARE_OPS[type(op)](_value(a), _value(b))
+                for op, a, b in zip(node.ops, operands, operands[1:]))
+        except Exception:
+            return node
+        return self._constant(result, node)
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        if not _is_constant(node.test):
+            return node
+        self.changed = True
+        return node.body if _value(node.test) else node.orelse
+
+
+def fold_expression(text: str) -> str:
+    """
+    Return text with constant sub-expressions evaluated. Text that is not a
+    valid expression or has nothing to fold is returned unchanged.
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError:
+        return text
+    folder = _ConstantFolder()
+    tree = folder.visit(tree)
+    if not folder.changed:
+        return text
+    return ast.unparse(tree)
+
+
+def constant_truth(text: str) -> Optional[bool]:
+    """
+    Return the truth value of a constant expression, None if not constant
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError:
+        return None
+    if _is_constant(tree.body):
+        return bool(_value(tree.body))
+    return None
+
+
+def _clause_expression(clause: Clause) -> str:
+    return clause.header.content.strip()
+
+
+def _fold_clause(clause: Clause) -> Optional[bool]:
+    expression = fold_expression(_clause_expression(clause))
+    clause.header.set_content(expression)
+    return constant_truth(expression)
+
+
+def _is_removable(clauses: Iterable[Clause]) -> bool:
+    """
+    Check the leaves below the clauses for statements that change the scope.
+    Rendering the suites instead would write pass into the empty ones.
+    """
+    for clause in clauses:
+        for statement in clause.suite.statements:
+            for node in walk(statement):
+                if node.iter_render is None and \
+                        _SCOPE_CHANGING.search(node.render()):
+                    return False
+    return True
+
+
+def _set_keyword(clause: Clause, keyword: str):
+    clause.header.keyword = keyword
+    if keyword == 'else':
+        clause.header.set_content('')
+
+
+def prune_if(statement, optimizer) -> RewriteResult:
+    if not isinstance(statement, IfStatement):
+        return None
+    clauses = [statement.if_clause] + statement.elif_clauses
+    kept = []
+    final = statement.else_clause
+    for clause in clauses:
+        truth = _fold_clause(clause)
+        if truth is False:
+            continue
+        if truth is True:
+            final = clause
+            break
+        kept.append(clause)
+
+    if kept == clauses and final is statement.else_clause:
+        return None
+    removed = [c for c in clauses + [statement.else_clause]
+               if c is not None and c not in kept and c is not final]
+    if not _is_removable(removed):
+        return None
+
+    if not kept:
+        return list(final.suite.statements) if final else []
+    statement.if_clause = kept[0]
+    statement.expression = _clause_expression(kept[0])
+    statement.elif_clauses = kept[1:]
+    statement.else_clause = final
+    _set_keyword(kept[0], 'if')
+    for clause in kept[1:]:
+        _set_keyword(clause, 'elif')
+    if final:
+        _set_keyword(final, 'else')
+    return None
+
+
+def prune_while(statement, optimizer) -> RewriteResult:
+    if not isinstance(statement, WhileStatement):
+        return None
+    truth = _fold_clause(statement.while_clause)
+    statement.expression = _clause_expression(statement.while_clause)
+    if truth is not False or not _is_removable([statement.while_clause]):
+        return None
+    # the else clause of a loop that never runs is always executed
+    if statement.else_clause:
+        return list(statement.else_clause.suite.statements)
+    return []
+
+
+def fold_assign(statement, optimizer) -> RewriteResult:
+    if isinstance(statement, Assign) and isinstance(statement.rhs, str):
+        statement.rhs = fold_expression(statement.rhs)
+    return None
+
+
+DEFAULT_RULES: List[RewriteRule] = [prune_if, prune_while, fold_assign]
+
+
+def iter_clauses(statement: Renderable):
+    for value in vars(statement).values():
+        if isinstance(value, Clause):
+            yield value
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, Clause):
+                    yield item
+
+
+class Optimizer:
+    """
+    Rewrites a py2py tree in place before rendering.
+
+    Every statement of every suite is passed to the rules in order. A rule
+    returns None to keep the statement (it may have changed it in place) or
+    the statement(s) to put in its place, which are then optimized in turn.
+    """
+    def __init__(self, rules: Optional[Iterable[RewriteRule]] = None):
+        self.rules: List[RewriteRule] = list(
+            DEFAULT_RULES if rules is None else rules)
+
+    def add_rule(self, rule: RewriteRule):
+        self.rules.append(rule)
+        return self
+
+    def rewrite(self, statement: Renderable) -> RewriteResult:
+        for rule in self.rules:
+            result = rule(statement, self)
+            if result is not None and result is not statement:
+                return result
+        return None
+
+    def optimize(self, tree: Renderable) -> Renderable:
+        if isinstance(tree, Suite):
+            suites = [tree]
+        else:
+            suites = [clause.suite for clause in iter_clauses(tree)]
+        while suites:
+            suite = suites.pop()
+            statements = self.optimize_statements(suite.statements)
+            if suite.symbols is not None:
+                self.update_symbols(suite, statements)
+            suite.statements = statements
+            for statement in suite.statements:
+                statement.set_parent(suite)
+                if isinstance(statement, Suite):
+                    suites.append(statement)
+                else:
+                    suites.extend(c.suite for c in iter_clauses(statement))
+        return tree
+
+    @staticmethod
+    def update_symbols(suite: Suite, statements: List[Renderable]):
+        old = set(map(id, suite.statements))
+        new = set(map(id, statements))
+        for statement in suite.statements:
+            if id(statement) not in new:
+                suite.symbols.discard(statement)
+        for statement in statements:
+            if id(statement) not in old:
+                suite.symbols.add(statement)
+
+    def optimize_statements(self, statements: List[Renderable]):
+        optimized = []
+        pending = list(reversed(statements))
+        while pending:
+            statement = pending.pop()
+            result = self.rewrite(statement)
+            if result is None:
+                optimized.append(statement)
+            elif isinstance(result, Renderable):
+                pending.append(result)
+            else:
+                pending.extend(reversed(result))
+        return optimized
+
+
+def optimize(tree: Renderable,
+             extra_rules: Iterable[RewriteRule] = ()) -> Renderable:
+    """
+    Fold constants and remove unreachable branches from tree in place
+    """
+    return Optimizer(DEFAULT_RULES + list(extra_rules)).optimize(tree)
@@ -1,10 +1,20 @@
+from .base import Py2PyException
 from .modules import Module
+from .. import telemetry
+from contextlib import contextmanager
 import os
+import zipfile
 
 
 class Package(object):
-    def __init__(self, name):
+    def __init__(self, name, lazy_submodules=False):
+        """
+        With lazy_submodules, modules and sub-packages are imported on first
+        access as attributes of the package (PEP 562 module __getattr__).
+        Sub-packages inherit the setting.
+        """
         self.name = name
+        self.lazy_submodules = lazy_submodules
         self.init_module = Module('__init__')
         self.modules = []
         self.sub_packages = []
@@ -12,20 +22,227 @@ class Package(object):
     def add_module(self, name):
         module = Module(name)
         self.modules.append(module)
+        if self.lazy_submodules:
+            self.init_module.lazy_submodules.append(name)
         return module
 
     def add_sub_package(self, name):
-        sub_package = Package(name)
+        sub_package = Package(name, lazy_submodules=self.lazy_submodules)
         self.sub_packages.append(sub_package)
+        if self.lazy_submodules:
+            self.init_module.lazy_submodules.append(name)
         return sub_package
 
     def write(self, statement):
         self.init_module.write(statement)
         return self
 
-    def save(self, dir_name):
-        package_path = os.path.join(dir_name, self.name)
-        os.makedirs(package_path)
-        self.init_module.save(package_path)
+    def save(self, dir_name, vectored=False, update_regions=False,
+             stubs=False, max_lines=None, max_bytes=None, listener=None):
+        """
+        Modules (other than __init__) larger than max_lines or max_bytes are
+        split into sub-packages, see Module.save(). The listener (a
+        telemetry.SaveListener) is told about every directory and file
+        written, and gets the totals once the whole hierarchy is saved.
+        """
+        with telemetry.run(listener):
+            package_path = os.path.join(dir_name, self.name)
+            start = telemetry.clock()
+            os.makedirs(package_path, exist_ok=update_regions)
+            if listener is not None:
+                listener.directory_created(package_path,
+                                           telemetry.clock() - start)
+            self.init_module.save(package_path, vectored=vectored,
+                                  update_regions=update_regions, stubs=stubs,
+                                  listener=listener)
+            for module in self.modules:
+                module.save(package_path, vectored=vectored,
+                            update_regions=update_regions, stubs=stubs,
+                            max_lines=max_lines, max_bytes=max_bytes,
+                            listener=listener)
+            for sub_package in self.sub_packages:
+                sub_package.save(package_path, vectored=vectored,
+                                 update_regions=update_regions, stubs=stubs,
+                                 max_lines=max_lines, max_bytes=max_bytes,
+                                 listener=listener)
+
+    def save_zip(self, zip_path, compile_pyc=False,
+                 compression=zipfile.ZIP_STORED):
+        """
+        Write the package hierarchy into a single archive importable with
+        zipimport, i.e. by adding zip_path to sys.path
+        """
+        with zipfile.ZipFile(zip_path, 'w', compression=compression) as f:
+            self.save_to_zip(f, compile_pyc=compile_pyc)
+
+    def add_to_importer(self, importer, prefix=''):
+        """
+        Make the package hierarchy importable through importer, an
+        importer.MemoryImporter
+        """
+        from .importer import check_loadable
+        fullname = prefix + self.name
+        check_loadable(self.init_module)
+        importer.add_source(fullname, self.init_module.render(),
+                            is_package=True)
+        for module in self.modules:
+            module.add_to_importer(importer, fullname + '.')
+        for sub_package in self.sub_packages:
+            sub_package.add_to_importer(importer, fullname + '.')
+
+    def load(self, importer=None):
+        """
+        Import the package from memory, without saving it, see Module.load()
+        """
+        from .importer import default_importer
+        if importer is None:
+            importer = default_importer()
+        self.add_to_importer(importer)
+        return importer.import_module(self.name)
+
+    def save_to_zip(self, zip_file, arc_dir='', compile_pyc=False):
+        package_path = arc_dir + self.name + '/'
+        self.init_module.save_to_zip(zip_file, package_path, compile_pyc)
         for module in self.modules:
-            module.save(package_path)
+            module.save_to_zip(zip_file, package_path, compile_pyc)
+        for sub_package in self.sub_packages:
+            sub_package.save_to_zip(zip_file, package_path, compile_pyc)
+
+
+class PackageWriter(object):
+    """
+    Writes a package module by module, so that only the module being
+    generated (and the __init__ modules) are in memory at a time.
+
+    Use as a context manager. A module obtained with module() is saved and
+    released when its with block ends; dotted names put it in sub-packages,
+    which are created on demand. The __init__ module of every package is
+    saved when the writer is closed, unless the with block of the writer
+    raised. Save options are those of
+    Package.save(); the listener gets the totals when the writer is closed.
+    """
+    def __init__(self, dir_name, name, lazy_submodules=False, vectored=False,
+                 update_regions=False, stubs=False, max_lines=None,
+                 max_bytes=None, listener=None):
+        self.dir_name = dir_name
+        self.name = name
+        self.lazy_submodules = lazy_submodules
+        self.save_options = dict(vectored=vectored,
+                                 update_regions=update_regions, stubs=stubs,
+                                 listener=listener)
+        self.split_options = dict(max_lines=max_lines, max_bytes=max_bytes)
+        self.listener = listener
+        self.path = os.path.join(dir_name, name)
+        self.init_module = Module('__init__')
+        self.sub_packages = {}  # name -> PackageWriter
+        self.module_names = set()
+        self.opened = False
+        self.closed = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def open(self):
+        if self.opened:
+            return
+        self.opened = True
+        if self.listener is not None:
+            self.listener.run_started()
+        start = telemetry.clock()
+        os.makedirs(self.path, exist_ok=self.save_options['update_regions'])
+        if self.listener is not None:
+            self.listener.directory_created(self.path,
+                                            telemetry.clock() - start)
+
+    def close(self):
+        """
+        Save the __init__ modules, of the sub-packages first
+        """
+        if self.closed:
+            return
+        self.open()
+        for sub_package in self.sub_packages.values():
+            sub_package.close()
+        self.init_module.save(self.path, **self.save_options)
+        self.init_module = None
+        self.closed = True
+        if self.listener is not None:
+            self.listener.run_ended()
+
+    def discard(self):
+        """
+        Close without saving the __init__ modules, e.g. after an error.
+        Modules saved so far are left in place.
+        """
+        if self.closed:
+            return
+        for sub_package in self.sub_packages.values():
+            sub_package.discard()
+        self.init_module = None
+        self.closed = True
+        if self.listener is not None and self.opened:
+            self.listener.run_ended()
+
+    def write(self, statement):
+        self.init_module.write(statement)
+        return self
+
+    def _add_name(self, name):
+        if self.closed:
+            raise Py2PyException(f'Package "{self.name}" is already closed')
+        if name in self.module_names or name in self.sub_packages:
+            raise Py2PyException(f'Duplicate module "{name}" in package '
+                                 f'"{self.name}"')
+        if self.lazy_submodules:
+            self.init_module.lazy_submodules.append(name)
+
+    def sub_package(self, name):
+        """
+        Return the writer of the sub-package called name (dotted for deeper
+        ones), creating its directory if needed
+        """
+        self.open()
+        writer = self
+        for part in name.split('.'):
+            sub_package = writer.sub_packages.get(part)
+            if sub_package is None:
+                writer._add_name(part)
+                sub_package = PackageWriter(writer.path, part,
+                                            self.lazy_submodules,
+                                            **writer.save_options,
+                                            **writer.split_options)
+                writer.sub_packages[part] = sub_package
+                sub_package.open()
+            writer = sub_package
+        return writer
+
+    def add_module(self, module, package=None):
+        """
+        Save module, built elsewhere, into this package or the named
+        sub-package right away
+        """
+        writer = self.sub_package(package) if package else self
+        writer.open()
+        writer._add_name(module.name)
+        writer.module_names.add(module.name)
+        module.save(writer.path, **writer.save_options,
+                    **writer.split_options)
+
+    @contextmanager
+    def module(self, name):
+        """
+        Context manager for a new module called name, saved when the with
+        block ends without an exception. "a.b.mod" puts the module in
+        sub-package a.b.
+        """
+        package, _, module_name = name.rpartition('.')
+        module = Module(module_name)
+        yield module
+        self.add_module(module, package)
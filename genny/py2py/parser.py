@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import ast
+import io
+import os
+import re
+import tokenize
+from typing import List, Optional, Sequence, Tuple
+
+from . import base
+from .base import Renderable, Suite
+from .modules import Module
+from .statements import ClassStatement, DefStatement
+
+# lines as the Python tokenizer counts them, with their line endings
+_LINE = re.compile(r'.*?(?:\r\n|\r|\n)|.+', re.DOTALL)
+
+
+def split_lines(source: str) -> List[str]:
+    return _LINE.findall(source)
+
+
+def reindent(text: str, from_level: int, to_level: int) -> str:
+    """
+    Move text parsed at from_level to to_level by adding or removing
+    leading indents on every non-blank line
+    """
+    if from_level == to_level:
+        return text
+    lines = split_lines(text)
+    if to_level > from_level:
+        prefix = base.INDENT * (to_level - from_level)
+        return ''.join(prefix + line if line.strip() else line
+                       for line in lines)
+    width = len(base.INDENT) * (from_level - to_level)
+    result = []
+    for line in lines:
+        stripped = line.lstrip(' \t')
+        removed = min(width, len(line) - len(stripped))
+        result.append(line[removed:])
+    return ''.join(result)
+
+
+def mark_modified(node: Optional[Renderable]):
+    """
+    Make node and the parsed statements containing it render from their
+    tree instead of their original text. Called when parsed suites change;
+    call it after changing parsed statements in place, e.g. appending to
+    the parameter_list of a ParsedDef.
+    """
+    while node is not None:
+        if isinstance(node, ParsedCompound):
+            if node.modified:
+                return  # so are the statements containing it
+            node.modified = True
+        if isinstance(node, Suite) and node.parent is None:
+            owner_ref = node.__dict__.get('_proxy_owner_ref')
+            node = owner_ref() if owner_ref is not None else None
+        else:
+            node = node.parent
+
+
+class SourceText(Renderable):
+    """
+    Statements kept as the text they were parsed from, for everything the
+    parser does not map to statements of its own
+    """
+    def __init__(self, text: str, indent_level: int = 0,
+                 names: Sequence[str] = ()):
+        super().__init__()
+        self._text = text
+        self.indent_level = indent_level
+        self.names = list(names)
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @text.setter
+    def text(self, text: str):
+        self._text = text
+        mark_modified(self.parent)
+
+    def symbol_names(self):
+        return self.names
+
+    def render_to_list(self, render_list, indent_level):
+        render_list.append(reindent(self._text, self.indent_level,
+                                    indent_level))
+
+
+class ParsedSuite(Suite):
+    tracking = False  # set once parsing is done
+
+    def add(self, statement):
+        statement = super().add(statement)
+        if self.tracking:
+            mark_modified(self)
+        return statement
+
+    def clear(self):
+        super().clear()
+        if self.tracking:
+            mark_modified(self)
+
+
+class ParsedCompound:
+    """
+    A parsed def or class statement. It renders as its original text until
+    it or a statement inside it is modified, and then keeps the original
+    header as long as the signature is unchanged.
+    """
+    signature_fields = ()
+    modified = False
+    tracking = False
+
+    def init_parsed(self, source: str, header: str, tail: str,
+                    indent_level: int):
+        suite = self.clause.suite
+        parsed_suite = ParsedSuite(proxy_methods=suite.proxy_methods,
+                                   proxy_owner=self.clause)
+        parsed_suite.symbols = suite.symbols
+        self.clause.suite = parsed_suite
+        self.source = source
+        self.header_source = header
+        self.tail = tail  # blank lines and comments after the body
+        self.indent_level = indent_level
+        self.signature_key = self.get_signature_key()
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.signature_fields and self.tracking:
+            mark_modified(self)
+
+    def get_signature_key(self):
+        return tuple(repr(getattr(self, name)) for name in
+                     self.signature_fields) + (repr(self.clause.decorators),)
+
+    def header_content(self) -> str:
+        raise NotImplementedError
+
+    def iter_render(self, render_list, indent_level):
+        signature_key = self.get_signature_key()
+        if not self.modified and signature_key == self.signature_key:
+            render_list.append(reindent(self.source, self.indent_level,
+                                        indent_level))
+            return
+        if signature_key == self.signature_key:
+            render_list.append(reindent(self.header_source,
+                                        self.indent_level, indent_level))
+            yield self.clause.suite, indent_level + 1
+        else:
+            self.clause.header.set_content(self.header_content())
+            yield self.clause, indent_level
+        render_list.append(reindent(self.tail, self.indent_level,
+                                    indent_level))
+
+
+class ParsedDef(ParsedCompound, DefStatement):
+    signature_fields = ('name', 'parameter_list', 'return_type')
+
+    def header_content(self):
+        return self.signature()
+
+
+class ParsedClass(ParsedCompound, ClassStatement):
+    signature_fields = ('name', 'bases')
+
+    def header_content(self):
+        return self.declaration()
+
+
+def _start_line(node: ast.stmt) -> int:
+    decorators = getattr(node, 'decorator_list', None)
+    if decorators:
+        return min(d.lineno for d in decorators)
+    return node.lineno
+
+
+def _bound_names(node: ast.stmt) -> List[str]:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                         ast.ClassDef)):
+        return [node.name]
+    if isinstance(node, ast.Assign):
+        return [t.id for t in node.targets if isinstance(t, ast.Name)]
+    if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+        return [node.target.id]
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return [alias.asname or alias.name.split('.')[0]
+                for alias in node.names if alias.name != '*']
+    return []
+
+
+def _bracketed(text: str) -> Optional[Tuple[str, str]]:
+    """
+    Split a def or class header (without decorators) into the text between
+    the parentheses that follow the name and the text after them, or None
+    if there are no parentheses
+    """
+    offsets = [0]
+    for line in split_lines(text):
+        offsets.append(offsets[-1] + len(line))
+    tokens = tokenize.generate_tokens(io.StringIO(text).readline)
+    depth = 0
+    start = None
+    try:
+        for i, token in enumerate(tokens):
+            if token.type != tokenize.OP:
+                if i > 1 and depth == 0 and start is None:
+                    return None  # e.g. the ':' of "class A:"
+                continue
+            if token.string in '([{':
+                if depth == 0:
+                    if token.string != '(' or i != 2:
+                        return None
+                    start = offsets[token.end[0] - 1] + token.end[1]
+                depth += 1
+            elif token.string in ')]}':
+                depth -= 1
+                if depth == 0 and start is not None:
+                    end = offsets[token.start[0] - 1] + token.start[1]
+                    return text[start:end], text[end + 1:]
+            elif depth == 0 and i == 2:
+                return None
+    except tokenize.TokenError:
+        return None
+    return None
+
+
+class _Parser:
+    def __init__(self, source: str):
+        self.lines = split_lines(source)
+
+    def text(self, first: int, last: int) -> str:
+        return ''.join(self.lines[first - 1:last])
+
+    def segment(self, node: ast.expr) -> str:
+        """
+        ast.get_source_segment() without splitting the source every time
+        """
+        first = self.lines[node.lineno - 1].encode('utf-8')
+        if node.end_lineno == node.lineno:
+            return first[node.col_offset:node.end_col_offset].decode('utf-8')
+        last = self.lines[node.end_lineno - 1].encode('utf-8')
+        return first[node.col_offset:].decode('utf-8') + \
+            self.text(node.lineno + 1, node.end_lineno - 1) + \
+            last[:node.end_col_offset].decode('utf-8')
+
+    def has_block(self, node) -> bool:
+        """
+        True if the body of node starts on a line of its own
+        """
+        first = node.body[0]
+        line = self.lines[first.lineno - 1].encode('utf-8')
+        return not line[:first.col_offset].strip()
+
+    def parse_body(self, body: List[ast.stmt], suite: Suite, end: int,
+                   indent_level: int):
+        for i, node in enumerate(body):
+            start = _start_line(node)
+            stop = _start_line(body[i + 1]) - 1 if i + 1 < len(body) \
+                else end
+            suite.add(self.parse_statement(node, start, stop, indent_level))
+
+    def parse_statement(self, node: ast.stmt, start: int, stop: int,
+                        indent_level: int) -> Renderable:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and \
+                not getattr(node, 'type_params', None) and \
+                self.has_block(node):
+            statement = self.parse_compound(node, start, stop, indent_level)
+            if statement is not None:
+                return statement
+        return SourceText(self.text(start, stop), indent_level,
+                          _bound_names(node))
+
+    def parse_compound(self, node, start: int, stop: int,
+                       indent_level: int) -> Optional[ParsedCompound]:
+        header_end = _start_line(node.body[0]) - 1
+        header = self.lines[node.lineno - 1][node.col_offset:] + \
+            self.text(node.lineno + 1, header_end)
+        parts = _bracketed(header)
+        decorators = [self.segment(d) for d in node.decorator_list]
+        if isinstance(node, ast.FunctionDef):
+            if parts is None:
+                return None
+            parameters = parts[0].strip()
+            return_type = self.segment(node.returns) if node.returns \
+                else None
+            statement = ParsedDef(node.name,
+                                  [parameters] if parameters else [],
+                                  decorators, return_type)
+        else:
+            bases = [parts[0].strip()] if parts is not None else None
+            statement = ParsedClass(node.name, bases, decorators)
+        statement.init_parsed(self.text(start, stop),
+                              self.text(start, header_end),
+                              self.text(node.end_lineno + 1, stop),
+                              indent_level)
+        suite = statement.clause.suite
+        self.parse_body(node.body, suite, node.end_lineno, indent_level + 1)
+        suite.tracking = True
+        statement.tracking = True
+        return statement
+
+
+def parse_module(source: str, name: str) -> Module:
+    """
+    Load Python source into a Module.
+
+    Def and class statements become ParsedDef and ParsedClass statements
+    with their bodies parsed in turn; everything else is kept as
+    SourceText. Rendering the module gives back source exactly. Only the
+    parsed statements that were changed (or contain changed statements)
+    are rendered from the tree, the others are copied from the source.
+    Blank lines and comments are kept with the statement before them.
+    """
+    tree = ast.parse(source)
+    parser = _Parser(source)
+    module = Module(name)
+    module.pass_if_empty = False
+    if tree.body:
+        prelude_end = _start_line(tree.body[0]) - 1
+    else:
+        prelude_end = len(parser.lines)
+    if prelude_end:
+        module.add(SourceText(parser.text(1, prelude_end)))
+    parser.parse_body(tree.body, module, len(parser.lines), 0)
+    return module
+
+
+def parse_file(path: str, name: Optional[str] = None,
+               encoding: str = 'utf-8') -> Module:
+    """
+    parse_module() for the file at path, named after the file by default
+    """
+    with open(path, encoding=encoding, newline='') as f:
+        source = f.read()
+    if name is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+    return parse_module(source, name)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import ast
+from typing import Dict, List, Optional
+
+from . import base
+from .modules import render_lazy_imports
+
+PART_PREFIX = '_part'
+# module globals of the generated __init__, deleted once the parts are set up
+LOOP_NAME = '_genny_split_part'
+SHARED_NAMES = '_genny_split_names'
+
+
+# expressions with their own scope
+_SCOPED = (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp,
+           ast.GeneratorExp)
+
+
+def _store_names(node: ast.AST) -> List[str]:
+    names = []
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.append(node.id)
+        elif not isinstance(node, _SCOPED):
+            pending.extend(reversed(list(ast.iter_child_nodes(node))))
+    return names
+
+
+def bound_names(source: str) -> List[str]:
+    """
+    Return the names bound at module level by source, in order of first
+    binding. Function and class bodies are not searched.
+    """
+    names = []
+    seen = set()
+    pending = list(reversed(ast.parse(source).body))
+    while pending:
+        node = pending.pop()
+        found = []
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                             ast.ClassDef)):
+            found.append(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue  # imports are repeated in every part
+        else:
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.stmt):
+                    pending.append(child)
+                elif isinstance(child, ast.excepthandler):
+                    if child.name:
+                        found.append(child.name)
+                    pending.extend(reversed(child.body))
+                else:
+                    found.extend(_store_names(child))
+        for name in found:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+    return names
+
+
+def _deepen_import(import_expr: str) -> str:
+    """
+    Make a relative import work from a part, which sits in a package one
+    level below the original module
+    """
+    if import_expr.startswith('from .'):
+        return 'from ..' + import_expr[len('from .'):]
+    return import_expr
+
+
+def _header(module, body_text: str) -> List[str]:
+    render_list = []
+    if module.encoding:
+        render_list.append(module.encoding)
+    imports = [_deepen_import(x) for x in module.get_imports(body_text)]
+    render_list.extend(imports)
+    if imports:
+        render_list.append(base.BLOCK_STATEMENT_EOS)
+    render_lazy_imports(render_list, module.get_imports(body_text, lazy=True))
+    return render_list
+
+
+def _render_items(render_list: List[str], items: List[str]):
+    for item in items:
+        render_list.append(f'{base.INDENT}{item},\n')
+
+
+def _render_import_list(render_list: List[str], source: str,
+                        names: List[str]):
+    render_list.append(f'from {source} import (\n')
+    _render_items(render_list, names)
+    render_list.append(')\n')
+
+
+def split_module(module, max_lines: Optional[int] = None,
+                 max_bytes: Optional[int] = None) -> Optional[Dict[str, str]]:
+    """
+    Shard the top-level statements of module across several part modules if
+    its rendering exceeds max_lines or max_bytes.
+
+    Returns None if the module is within budget, else a dict mapping module
+    names (the parts and '__init__') to their source. Every part imports the
+    names defined by the parts before it, and the generated __init__
+    re-exports all names and shares them with every part, so references
+    between parts and the public import paths keep working. Module globals
+    rebound at runtime are not kept in sync between parts. Relative imports
+    of the module are given one more leading dot in the parts; relative
+    imports inside statements are copied unchanged.
+    """
+    chunks = [statement.render() for statement in module.statements]
+    header = _header(module, ''.join(chunks))
+    header_text = ''.join(header)
+    total_bytes = len(header_text.encode('utf-8')) + sum(
+        len(chunk.encode('utf-8')) for chunk in chunks)
+    total_lines = header_text.count('\n') + sum(
+        chunk.count('\n') for chunk in chunks)
+    if (max_lines is None or total_lines <= max_lines) and \
+            (max_bytes is None or total_bytes <= max_bytes):
+        return None
+
+    parts = []  # lists of chunks
+    lines = size = 0
+    for chunk in chunks:
+        chunk_lines = chunk.count('\n')
+        chunk_bytes = len(chunk.encode('utf-8'))
+        over_budget = (
+            (max_lines is not None and lines + chunk_lines > max_lines) or
+            (max_bytes is not None and size + chunk_bytes > max_bytes))
+        if not parts or (over_budget and parts[-1]):
+            parts.append([])
+            lines = size = 0
+        parts[-1].append(chunk)
+        lines += chunk_lines
+        size += chunk_bytes
+
+    sources = {}
+    part_names = []
+    defined = []  # (part name, names) for earlier parts
+    for i, part in enumerate(parts):
+        part_name = f'{PART_PREFIX}{i}'
+        render_list = list(header)
+        for earlier_name, names in defined:
+            _render_import_list(render_list, f'.{earlier_name}', names)
+        if defined:
+            render_list.append(base.BLOCK_STATEMENT_EOS)
+        body = ''.join(part)
+        render_list.append(body)
+        sources[part_name] = ''.join(render_list)
+        names = bound_names(body)
+        if names:
+            defined.append((part_name, names))
+        part_names.append(part_name)
+
+    render_list = []
+    if module.encoding:
+        render_list.append(module.encoding)
+    _render_import_list(render_list, '.', part_names)
+    all_names = []
+    for part_name, names in defined:
+        _render_import_list(render_list, f'.{part_name}', names)
+        all_names.extend(names)
+    render_list.append(base.BLOCK_STATEMENT_EOS)
+    # the helper names are prefixed so as not to clobber exported names
+    render_list.append(f'{SHARED_NAMES} = (\n')
+    _render_items(render_list, [repr(x) for x in dict.fromkeys(all_names)])
+    render_list.append(')\n')
+    render_list.append(f'for {LOOP_NAME} in (\n')
+    _render_items(render_list, part_names)
+    render_list.append('):\n')
+    render_list.append(f'{base.INDENT}{LOOP_NAME}.__dict__.update(\n')
+    render_list.append(f'{base.INDENT * 2}(x, globals()[x]) '
+                       f'for x in {SHARED_NAMES})\n')
+    render_list.append(f'del {LOOP_NAME}, {SHARED_NAMES}\n')
+    sources['__init__'] = ''.join(render_list)
+    return sources
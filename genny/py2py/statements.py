@@ -1,8 +1,15 @@
 from __future__ import annotations
 
-from typing import Union
-from .base import Clause, CompoundStatement, Py2PyException, Renderable
+import array
+import ast
+import binascii
+import sys
+from typing import Iterable, Optional, Union
+from .base import (Clause, ClauseHeader, CompoundStatement, Py2PyException,
+                   Renderable, Suite)
 from . import base
+from .. import regions
+from ..symbols import SymbolTable
 
 
 class BlankLine(Renderable):
@@ -10,31 +17,217 @@ class BlankLine(Renderable):
         render_list.append(base.BLOCK_STATEMENT_EOS)
 
 
+class Region(Suite):
+    """
+    Statements between generated region markers, see Module.save()
+    """
+    shares_symbols = True
+
+    def __init__(self, name):
+        super().__init__(pass_if_empty=False)
+        self.name = name
+
+    def is_empty(self) -> bool:
+        return all(isinstance(x, Region) and x.is_empty()
+                   for x in self.statements)
+
+    def needs_pass(self) -> bool:
+        """
+        True if this region has no statements and neither has the rest of
+        the block it is in, which then needs a pass statement to be valid
+        """
+        if self.statements:
+            return False
+        suite = self.parent
+        while isinstance(suite, Region):
+            suite = suite.parent
+        return isinstance(suite, Suite) and suite.pass_if_empty and \
+            Region.is_empty(suite)
+
+    def iter_render(self, render_list, indent_level):
+        render_list.append(base.do_indent(
+            regions.begin_marker('#', self.name), indent_level))
+        render_list.append(base.BLOCK_STATEMENT_EOS)
+        if self.needs_pass():
+            render_list.append(base.do_indent('pass\n', indent_level))
+        yield from super().iter_render(render_list, indent_level)
+        render_list.append(base.do_indent(
+            regions.end_marker('#', self.name), indent_level))
+        render_list.append(base.BLOCK_STATEMENT_EOS)
+
+
+def _is_single_target(lhs: Union[str, Renderable]) -> bool:
+    text = lhs if isinstance(lhs, str) else lhs.render()
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError:
+        return False
+    return isinstance(tree.body, (ast.Name, ast.Attribute, ast.Subscript))
+
+
 class Assign(Renderable):
     def __init__(self,
                  lhs: Union[str, Renderable],
-                 rhs: Union[str, Renderable]):
+                 rhs: Optional[Union[str, Renderable]],
+                 type_hint: Optional[str] = None):
+        if rhs is None and not type_hint:
+            raise Py2PyException('Assign without a value needs a type_hint')
+        if type_hint and not _is_single_target(lhs):
+            raise Py2PyException(f'Only a single name, attribute or '
+                                 f'subscript can be annotated, not "{lhs}"')
         self.lhs = lhs
         self.rhs = rhs
+        self.type_hint = type_hint
         super().__init__()
 
+    def symbol_names(self):
+        if not isinstance(self.lhs, str):
+            return []
+        return [target.strip() for target in self.lhs.split('=')
+                if target.strip().isidentifier()]
+
     def render_to_list(self, render_list, indent_level):
         base.render_item_to_list(self.lhs, render_list, indent_level)
-        render_list.append(' = ')
-        base.render_item_to_list(self.rhs, render_list, indent_level=0)
+        if self.type_hint:
+            render_list.append(f': {self.type_hint}')
+        if self.rhs is not None:
+            render_list.append(' = ')
+            base.render_item_to_list(self.rhs, render_list, indent_level=0)
         render_list.append(base.BLOCK_STATEMENT_EOS)
 
 
+class NumericArray(Renderable):
+    """
+    A table of numbers bound to name, rendered as the bytes of an
+    array.array instead of a list literal so that the module imports
+    without parsing and building millions of number objects.
+
+    typecode is any array.array typecode of fixed size (b, B, h, H, i, I,
+    q, Q, f or d), by default the smallest signed integer type that holds
+    all values, or 'd' if any value is not an int. The bytes are embedded
+    in base64, or with sidecar written by Module.save() to a file of that
+    name next to the module; the file is memory-mapped at import time and
+    name is bound to a read-only memoryview of it. The names the loading
+    code imports are deleted again, leaving only name behind.
+    """
+    INT_TYPECODES = 'bhiq'
+
+    def __init__(self, name: str, values: Iterable[Union[int, float]],
+                 typecode: Optional[str] = None,
+                 sidecar: Optional[str] = None):
+        super().__init__()
+        if not isinstance(values, array.array):
+            values = list(values)
+            if typecode is None:
+                typecode = self.infer_typecode(values)
+            values = array.array(typecode, values)
+        elif typecode is not None and typecode != values.typecode:
+            values = array.array(typecode, values)
+        if values.typecode not in 'bBhHiIqQfd':
+            raise Py2PyException(f'Unsupported typecode '
+                                 f'"{values.typecode}" for "{name}"')
+        self.name = name
+        self.values = values
+        self.sidecar = sidecar
+
+    def symbol_names(self):
+        return [self.name]
+
+    @classmethod
+    def infer_typecode(cls, values) -> str:
+        if not all(isinstance(x, int) for x in values):
+            return 'd'
+        low = min(values, default=0)
+        high = max(values, default=0)
+        for typecode in cls.INT_TYPECODES:
+            bits = array.array(typecode).itemsize * 8
+            if -2 ** (bits - 1) <= low and high < 2 ** (bits - 1):
+                return typecode
+        raise Py2PyException('Integer values do not fit in 64 bits')
+
+    def data(self) -> bytes:
+        """
+        The values as little-endian bytes
+        """
+        if sys.byteorder == 'little' or self.values.itemsize == 1:
+            return self.values.tobytes()
+        values = array.array(self.values.typecode, self.values)
+        values.byteswap()
+        return values.tobytes()
+
+    def render_to_list(self, render_list, indent_level):
+        typecode = self.values.typecode
+        eos = base.BLOCK_STATEMENT_EOS
+        lines = ['from sys import byteorder as _byteorder',
+                 'from array import array as _array']
+        if self.sidecar and self.values:
+            lines += [
+                'from mmap import mmap as _mmap, ACCESS_READ as _ACCESS_READ',
+                'from os.path import dirname as _dirname, join as _join',
+                f'with open(_join(_dirname(__file__), {self.sidecar!r}), '
+                f"'rb') as _f:",
+                f'{base.INDENT}{self.name} = memoryview(_mmap(_f.fileno(), 0, '
+                f'access=_ACCESS_READ)).cast({typecode!r})',
+                "if _byteorder != 'little':",
+                f'{base.INDENT}{self.name} = _array({typecode!r}, '
+                f'{self.name}.tobytes())',
+                f'{base.INDENT}{self.name}.byteswap()',
+                'del _byteorder, _array, _mmap, _ACCESS_READ, _dirname, '
+                '_join, _f',
+            ]
+        else:
+            encoded = binascii.b2a_base64(self.data(), newline=False)
+            lines += [
+                'from binascii import a2b_base64 as _a2b_base64',
+                f'{self.name} = _array({typecode!r}, '
+                f'_a2b_base64({encoded!r}))',
+                "if _byteorder != 'little':",
+                f'{base.INDENT}{self.name}.byteswap()',
+                'del _byteorder, _array, _a2b_base64',
+            ]
+        for line in lines:
+            render_list.append(base.do_indent(line, indent_level))
+            render_list.append(eos)
+
+
+class Parameter:
+    """
+    A function parameter, optionally annotated. Plain strings can be used in
+    parameter lists wherever no annotation is needed.
+    """
+    def __init__(self, name: str, type_hint: Optional[str] = None,
+                 default: Optional[str] = None):
+        self.name = name
+        self.type_hint = type_hint
+        self.default = default
+
+    def render(self, stub: bool = False) -> str:
+        default = '...' if stub else self.default
+        if self.type_hint:
+            text = f'{self.name}: {self.type_hint}'
+            if self.default is not None:
+                text += f' = {default}'
+        else:
+            text = self.name
+            if self.default is not None:
+                text += f'={default}'
+        return text
+
+
+def render_parameter(parameter: Union[str, Parameter],
+                     stub: bool = False) -> str:
+    if isinstance(parameter, str):
+        return parameter
+    return parameter.render(stub)
+
+
 class IfStatement(CompoundStatement):
     def __init__(self, expression):
         super().__init__()
         self.expression = expression
         self.if_clause = Clause('if', content=expression,
                                 parent=self,
-                                proxy_methods={
-                                    'elif_': self.elif_,
-                                    'else_': self.else_
-                                })
+                                proxy_methods=('elif_', 'else_'))
         self.elif_clauses = []
         self.else_clause = None
 
@@ -47,12 +240,8 @@ class IfStatement(CompoundStatement):
     def elif_(self, expression):
         elif_clause = Clause('elif', content=expression,
                              parent=self,
-                             proxy_methods={
-                                 'elif_': self.elif_,
-                                 'else_': self.else_
-                             })
+                             proxy_methods=('elif_', 'else_'))
         self.elif_clauses.append(elif_clause)
-        print('elif returning', elif_clause)
         return elif_clause
 
     def else_(self):
@@ -63,12 +252,12 @@ class IfStatement(CompoundStatement):
             raise Py2PyException('Only one "else" clause permitted in '
                                  '"if" statement')
 
-    def render_to_list(self, render_list, indent_level):
-        self.if_clause.render_to_list(render_list, indent_level)
+    def iter_render(self, render_list, indent_level):
+        yield self.if_clause, indent_level
         for elif_clause in self.elif_clauses:
-            elif_clause.render_to_list(render_list, indent_level)
+            yield elif_clause, indent_level
         if self.else_clause:
-            self.else_clause.render_to_list(render_list, indent_level)
+            yield self.else_clause, indent_level
 
 
 class WhileStatement(CompoundStatement):
@@ -78,9 +267,7 @@ class WhileStatement(CompoundStatement):
 
         self.while_clause = Clause('while', content=expression,
                                    parent=self,
-                                   proxy_methods={
-                                       'else_': self.else_
-                                   })
+                                   proxy_methods=('else_',))
 
         self.else_clause = None
 
@@ -99,10 +286,10 @@ class WhileStatement(CompoundStatement):
             raise Py2PyException('Only one "else" clause permitted in '
                                  '"while" statement')
 
-    def render_to_list(self, render_list, indent_level):
-        self.while_clause.render_to_list(render_list, indent_level)
+    def iter_render(self, render_list, indent_level):
+        yield self.while_clause, indent_level
         if self.else_clause:
-            self.else_clause.render_to_list(render_list, indent_level)
+            yield self.else_clause, indent_level
 
 
 class ForStatement(CompoundStatement):
@@ -115,9 +302,7 @@ class ForStatement(CompoundStatement):
             'for',
             content=f'{target_list} in {in_}',
             parent=self,
-            proxy_methods={
-                'else_': self.else_
-            })
+            proxy_methods=('else_',))
 
         self.else_clause = None
 
@@ -136,10 +321,10 @@ class ForStatement(CompoundStatement):
             raise Py2PyException('Only one "else" clause permitted in '
                                  '"for" statement')
 
-    def render_to_list(self, render_list, indent_level):
-        self.for_clause.render_to_list(render_list, indent_level)
+    def iter_render(self, render_list, indent_level):
+        yield self.for_clause, indent_level
         if self.else_clause:
-            self.else_clause.render_to_list(render_list, indent_level)
+            yield self.else_clause, indent_level
 
 
 class TryStatement(CompoundStatement):
@@ -149,11 +334,8 @@ class TryStatement(CompoundStatement):
         self.try_clause = Clause('try',
                                  content='',
                                  parent=self,
-                                 proxy_methods={
-                                     'else_': self.else_,
-                                     'except_': self.except_,
-                                     'finally_': self.finally_
-                                 })
+                                 proxy_methods=('else_', 'except_',
+                                                'finally_'))
         self.except_clauses = []
         self.else_clause = None
         self.finally_clause = None
@@ -175,9 +357,7 @@ class TryStatement(CompoundStatement):
         
     def except_(self, expression):
         except_clause = Clause('except', content=expression, parent=self,
-                               proxy_methods={
-                                   'except_': self.except_
-                               })
+                               proxy_methods=('except_',))
         self.except_clauses.append(except_clause)
         return except_clause
     
@@ -189,17 +369,134 @@ class TryStatement(CompoundStatement):
             raise Py2PyException('Only one "finally" clause permitted in '
                                  '"try" statement')
 
-    def render_to_list(self, render_list, indent_level):
+    def iter_render(self, render_list, indent_level):
         if not self.except_clauses and not self.finally_clause:
             raise Py2PyException('"try" statement must have at-least one '
                                  '"except" clause or a "finally" clause')
-        self.try_clause.render_to_list(render_list, indent_level)
+        yield self.try_clause, indent_level
         for except_clause in self.except_clauses:
-            except_clause.render_to_list(render_list, indent_level)
+            yield except_clause, indent_level
         if self.else_clause:
-            self.else_clause.render_to_list(render_list, indent_level)
+            yield self.else_clause, indent_level
         if self.finally_clause:
-            self.finally_clause.render_to_list(render_list, indent_level)
+            yield self.finally_clause, indent_level
+
+
+class MatchStatement(CompoundStatement):
+    def __init__(self, subject):
+        super().__init__()
+        self.subject = subject
+        self.header = ClauseHeader('match', content=subject)
+        self.case_clauses = []
+        self.has_default = False
+
+    def get_clause(self) -> Clause:
+        if not self.case_clauses:
+            raise Py2PyException('"match" statement has no "case" clause')
+        return self.case_clauses[-1]
+
+    def case_(self, pattern):
+        if self.has_default:
+            raise Py2PyException('"case _" must be the last clause of '
+                                 '"match" statement')
+        case_clause = Clause('case', content=pattern, parent=self,
+                             proxy_methods=('case_', 'default_'))
+        self.case_clauses.append(case_clause)
+        return case_clause
+
+    def default_(self):
+        case_clause = self.case_('_')
+        self.has_default = True
+        return case_clause
+
+    def iter_render(self, render_list, indent_level):
+        if not self.case_clauses:
+            raise Py2PyException('"match" statement must have at-least one '
+                                 '"case" clause')
+        self.header.render_to_list(render_list, indent_level)
+        for case_clause in self.case_clauses:
+            yield case_clause, indent_level + 1
+
+
+class DispatchTable(CompoundStatement):
+    """
+    A dict mapping constants to handler functions, for O(1) dispatch where
+    a long if/elif chain would compare against each constant in turn.
+
+    Renders a def per case followed by the dict; use lookup() or call() to
+    get the dispatch expression.
+    """
+    unique_symbol = True
+
+    def __init__(self, name, parameter_list=None):
+        super().__init__()
+        self.name = name
+        self.parameter_list = parameter_list or []
+        self.cases = []  # (keys, handler)
+        self.keys = set()
+        self.default_handler = None
+
+    def get_clause(self) -> Clause:
+        if not self.cases:
+            raise Py2PyException(f'Dispatch table "{self.name}" has no '
+                                 f'cases')
+        return self.cases[-1][1].get_clause()
+
+    def _add_handler(self, name):
+        handler = DefStatement(name, list(self.parameter_list))
+        handler.set_parent(self)
+        return handler
+
+    def case_(self, *keys):
+        duplicates = self.keys.intersection(keys)
+        if duplicates:
+            raise Py2PyException(
+                f'Duplicate keys in dispatch table "{self.name}": '
+                f'{", ".join(sorted(map(repr, duplicates)))}')
+        self.keys.update(keys)
+        handler = self._add_handler(f'{self.name}_case_{len(self.cases)}')
+        self.cases.append((keys, handler))
+        return handler
+
+    def default_(self):
+        if self.default_handler:
+            raise Py2PyException(f'Only one default handler permitted in '
+                                 f'dispatch table "{self.name}"')
+        self.default_handler = self._add_handler(f'{self.name}_default')
+        return self.default_handler
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        for _, handler in self.cases:
+            handler.set_parent(self)
+        if self.default_handler:
+            self.default_handler.set_parent(self)
+
+    def symbol_names(self):
+        return [self.name]
+
+    def lookup(self, subject):
+        if self.default_handler:
+            return f'{self.name}.get({subject}, {self.default_handler.name})'
+        return f'{self.name}[{subject}]'
+
+    def call(self, subject, *args):
+        return f'{self.lookup(subject)}({", ".join(args)})'
+
+    def iter_render(self, render_list, indent_level):
+        for _, handler in self.cases:
+            yield handler, indent_level
+        if self.default_handler:
+            yield self.default_handler, indent_level
+        render_list.append(base.do_indent(f'{self.name} = {{', indent_level))
+        render_list.append(base.BLOCK_STATEMENT_EOS)
+        for keys, handler in self.cases:
+            for key in keys:
+                render_list.append(base.do_indent(f'{key}: {handler.name},',
+                                                  indent_level + 1))
+                render_list.append(base.BLOCK_STATEMENT_EOS)
+        render_list.append(base.do_indent('}', indent_level))
+        render_list.append(base.BLOCK_STATEMENT_EOS)
 
 
 class WithStatement(CompoundStatement):
@@ -223,17 +520,21 @@ class WithStatement(CompoundStatement):
     def _render_item(item):
         return f'{item[0]} as {item[1]}' if item[1] else item[0]
 
-    def render_to_list(self, render_list, indent_level):
+    def iter_render(self, render_list, indent_level):
         rendered_items = ', '.join([self._render_item(x) for x in self.items])
         self.clause.header.set_content(rendered_items)
-        self.clause.render_to_list(render_list, indent_level=indent_level)
+        yield self.clause, indent_level
 
 
 class DefStatement(CompoundStatement):
-    def __init__(self, name, parameter_list=None, decorators=None):
+    unique_symbol = True
+
+    def __init__(self, name, parameter_list=None, decorators=None,
+                 return_type=None):
         super().__init__()
         self.name = name
         self.parameter_list = parameter_list or []
+        self.return_type = return_type
         self.clause = Clause('def', content='', parent=self,
                              decorators=decorators)
 
@@ -244,20 +545,48 @@ class DefStatement(CompoundStatement):
         self.clause.write(statement)
         return self
 
-    def render_to_list(self, render_list, indent_level):
-        params = ', '.join(self.parameter_list)
+    def symbol_names(self):
+        return [self.name]
+
+    def signature(self, stub=False):
+        params = ', '.join([render_parameter(x, stub)
+                            for x in self.parameter_list])
         func_str = f'{self.name}({params})'
-        self.clause.header.set_content(func_str)
-        self.clause.render_to_list(render_list, indent_level=indent_level)
+        if self.return_type:
+            func_str += f' -> {self.return_type}'
+        return func_str
+
+    def iter_render(self, render_list, indent_level):
+        self.clause.header.set_content(self.signature())
+        yield self.clause, indent_level
 
 
 class ClassStatement(CompoundStatement):
+    unique_symbol = True
+
     def __init__(self, name, bases=None, decorators=None):
         self.name = name
         self.bases = bases
         super().__init__()
         self.clause = Clause('class', content='', parent=self,
                              decorators=decorators)
+        self.clause.suite.symbols = SymbolTable(Py2PyException)
+
+    @property
+    def symbols(self) -> SymbolTable:
+        return self.clause.suite.symbols
+
+    def symbol_names(self):
+        return [self.name]
+
+    def lookup(self, qualified_name):
+        """
+        Return the member that binds qualified_name last, or None
+        """
+        return self.symbols.lookup(qualified_name)
+
+    def duplicates(self):
+        return self.symbols.duplicates()
 
     def get_clause(self) -> Clause:
         return self.clause
@@ -266,14 +595,22 @@ class ClassStatement(CompoundStatement):
         self.clause.write(statement)
         return self
 
-    def add_method(self, name, parameter_list=None, decorators=None):
+    def add_attribute(self, name, type_hint, value=None):
+        statement = Assign(name, value, type_hint)
+        self.write(statement)
+        return statement
+
+    def add_method(self, name, parameter_list=None, decorators=None,
+                   return_type=None):
         if parameter_list is None:
             parameter_list = []
         parameter_list.insert(0, 'self')
 
-        return self.add_method_(name, parameter_list, decorators)
+        return self.add_method_(name, parameter_list, decorators,
+                                return_type)
 
-    def add_class_method(self, name, parameter_list=None, decorators=None):
+    def add_class_method(self, name, parameter_list=None, decorators=None,
+                         return_type=None):
         if parameter_list is None:
             parameter_list = []
         parameter_list.insert(0, 'cls')
@@ -282,9 +619,11 @@ class ClassStatement(CompoundStatement):
             decorators = []
         decorators.append('classmethod')
 
-        return self.add_method_(name, parameter_list, decorators)
+        return self.add_method_(name, parameter_list, decorators,
+                                return_type)
 
-    def add_static_method(self, name, parameter_list=None, decorators=None):
+    def add_static_method(self, name, parameter_list=None, decorators=None,
+                          return_type=None):
         if parameter_list is None:
             parameter_list = []
 
@@ -292,18 +631,23 @@ class ClassStatement(CompoundStatement):
             decorators = []
         decorators.append('staticmethod')
 
-        return self.add_method_(name, parameter_list, decorators)
+        return self.add_method_(name, parameter_list, decorators,
+                                return_type)
 
-    def add_method_(self, name, parameter_list, decorators=None):
-        statement = DefStatement(name, parameter_list, decorators)
+    def add_method_(self, name, parameter_list, decorators=None,
+                    return_type=None):
+        statement = DefStatement(name, parameter_list, decorators,
+                                 return_type)
         self.write(statement)
         return statement
 
-    def render_to_list(self, render_list, indent_level):
+    def declaration(self):
         base_part = '({})'.format(','.join(self.bases)) if self.bases else ''
-        content = f'{self.name}{base_part}'
-        self.clause.header.set_content(content)
-        self.clause.render_to_list(render_list, indent_level=indent_level)
+        return f'{self.name}{base_part}'
+
+    def iter_render(self, render_list, indent_level):
+        self.clause.header.set_content(self.declaration())
+        yield self.clause, indent_level
         render_list.append(base.BLOCK_STATEMENT_EOS)
         render_list.append(base.BLOCK_STATEMENT_EOS)
 
@@ -326,5 +670,7 @@ class FunctionCall(Renderable):
             render_list.append(f'{key}=')
             base.render_item_to_list(value, render_list, indent_level=0)
             render_list.append(', ')
-        render_list.pop()
+        if self.args or self.kwargs:
+            render_list.pop()
         render_list.append(')')
+        render_list.append(base.BLOCK_STATEMENT_EOS)
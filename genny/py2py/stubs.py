@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import ast
+from typing import List, Optional, Tuple
+
+from . import base
+from .base import Suite
+from .modules import render_lazy_imports
+from .statements import Assign, ClassStatement, DefStatement, NumericArray
+
+
+def render_stub(module) -> str:
+    """
+    Render the .pyi stub of a module: imports, function signatures, classes
+    and annotated assignments. Other statements are left out.
+    """
+    body: List[str] = []
+    needs_any = _render_stub_body(module.statements, body, 0)
+    imports = sorted(module.imports)
+    if needs_any and 'from typing import Any\n' not in imports:
+        imports.append('from typing import Any\n')
+        imports.sort()
+    render_list = list(imports)
+    if imports:
+        render_list.append(base.BLOCK_STATEMENT_EOS)
+    render_lazy_imports(render_list, sorted(module.lazy_imports), stub=True)
+    render_list.extend(body)
+    return ''.join(render_list)
+
+
+def _render_stub_body(statements, render_list: List[str],
+                      indent_level: int) -> bool:
+    """
+    Append the stub of statements to render_list. Returns True if typing.Any
+    was used for an unannotated assignment.
+    """
+    needs_any = False
+    pending = list(reversed(statements))
+    while pending:
+        statement = pending.pop()
+        if isinstance(statement, Suite):  # e.g. a Region
+            pending.extend(reversed(statement.statements))
+        elif isinstance(statement, DefStatement):
+            _render_decorators(statement, render_list, indent_level)
+            render_list.append(base.do_indent(
+                f'def {statement.signature(stub=True)}: ...\n',
+                indent_level))
+        elif isinstance(statement, ClassStatement):
+            _render_decorators(statement, render_list, indent_level)
+            render_list.append(base.do_indent(
+                f'class {statement.declaration()}:\n', indent_level))
+            start = len(render_list)
+            needs_any |= _render_stub_body(statement.clause.suite.statements,
+                                           render_list, indent_level + 1)
+            if len(render_list) == start:
+                render_list.append(base.do_indent('...\n', indent_level + 1))
+        elif isinstance(statement, NumericArray):
+            render_list.append(base.do_indent(f'{statement.name}: Any\n',
+                                              indent_level))
+            needs_any = True
+        elif isinstance(statement, Assign) and isinstance(statement.lhs, str):
+            for name, type_hint in _assigned_names(statement):
+                if not type_hint:
+                    type_hint = 'Any'
+                    needs_any = True
+                render_list.append(base.do_indent(f'{name}: {type_hint}\n',
+                                                  indent_level))
+    return needs_any
+
+
+def _assigned_names(statement: Assign) -> List[Tuple[str, Optional[str]]]:
+    """
+    Return the names bound by an assignment with their type hint. Only
+    plain names, also inside tuple targets, can be stubbed; the type hint
+    only applies to names that are whole targets.
+    """
+    try:
+        tree = ast.parse(f'{statement.lhs} = None')
+    except SyntaxError:
+        return []
+    if not isinstance(tree.body[0], ast.Assign):
+        return []
+    names = []
+    pending = [(target, statement.type_hint)
+               for target in reversed(tree.body[0].targets)]
+    while pending:
+        target, type_hint = pending.pop()
+        if isinstance(target, ast.Name):
+            names.append((target.id, type_hint))
+        elif isinstance(target, ast.Starred):
+            pending.append((target.value, None))
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            pending.extend((x, None) for x in reversed(target.elts))
+    return names
+
+
+def _render_decorators(statement, render_list: List[str], indent_level: int):
+    for d in statement.clause.decorators:
+        decorator = statement.clause.render_decorator(d)
+        if decorator:
+            render_list.append(base.do_indent(decorator, indent_level))
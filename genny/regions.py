@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from typing import Dict, List
+
+BEGIN = 'genny:begin'
+END = 'genny:end'
+
+
+class RegionError(Exception):
+    pass
+
+
+def begin_marker(comment: str, name: str) -> str:
+    return f'{comment} {BEGIN} {name}'
+
+
+def end_marker(comment: str, name: str) -> str:
+    return f'{comment} {END} {name}'
+
+
+def _parse_marker(line: str, comment: str):
+    """
+    Return (kind, name) if line is a region marker, else None
+    """
+    text = line.strip()
+    if not text.startswith(comment):
+        return None
+    parts = text[len(comment):].split(None, 1)
+    if len(parts) == 2 and parts[0] in (BEGIN, END):
+        return parts[0], parts[1].strip()
+    return None
+
+
+def extract_regions(text: str, comment: str) -> Dict[str, List[str]]:
+    """
+    Return the body lines of every marked region in text, keyed by name
+    """
+    regions = {}
+    name = None
+    body = []
+    for line in text.splitlines(keepends=True):
+        marker = _parse_marker(line, comment)
+        if marker is None:
+            if name is not None:
+                body.append(line)
+        elif marker[0] == BEGIN:
+            if name is not None:
+                raise RegionError(f'Region "{marker[1]}" starts inside '
+                                  f'region "{name}"')
+            if marker[1] in regions:
+                raise RegionError(f'Duplicate region "{marker[1]}"')
+            name = marker[1]
+            body = []
+        else:
+            if marker[1] != name:
+                raise RegionError(f'Unexpected end of region "{marker[1]}"')
+            regions[name] = body
+            name = None
+    if name is not None:
+        raise RegionError(f'Region "{name}" is not closed')
+    return regions
+
+
+def update_regions(path: str, generated_text: str, comment: str,
+                   encoding: str = 'utf-8') -> bool:
+    """
+    Replace the marked regions of the existing file at path with the
+    matching regions of generated_text, keeping everything outside the
+    regions as is.
+
+    The existing file is streamed once and the result is written to a
+    temporary file that replaces it only if some region changed. Returns True
+    if the file was rewritten. Regions of the existing file that are not in
+    generated_text are left untouched.
+    """
+    regions = extract_regions(generated_text, comment)
+    seen = set()
+    changed = False
+    dir_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name, suffix='.tmp')
+    try:
+        with open(path, 'r', encoding=encoding, newline='') as src, \
+                os.fdopen(fd, 'w', encoding=encoding, newline='') as dst:
+            name = None
+            old_body = []
+            for line in src:
+                marker = _parse_marker(line, comment)
+                if name is not None:
+                    if marker == (END, name):
+                        new_body = regions[name]
+                        if new_body != old_body:
+                            changed = True
+                        dst.writelines(new_body)
+                        dst.write(line)
+                        name = None
+                    else:
+                        old_body.append(line)
+                    continue
+                dst.write(line)
+                if marker is not None and marker[0] == BEGIN \
+                        and marker[1] in regions:
+                    name = marker[1]
+                    seen.add(name)
+                    old_body = []
+            if name is not None:
+                raise RegionError(f'Region "{name}" is not closed in {path}')
+
+        missing = sorted(set(regions) - seen)
+        if missing:
+            raise RegionError(f'Regions not found in {path}: '
+                              f'{", ".join(missing)}')
+        if changed:
+            shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+            tmp_path = None
+    finally:
+        if tmp_path is not None:
+            os.unlink(tmp_path)
+    return changed
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, Iterator, List, Optional, Union
+
+CHUNK_SIZE = 64 * 1024  # characters
+
+
+def iter_chunks(node, render_list: List[str], indent,
+                chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Render node piecemeal, yielding its text in chunks of at most chunk_size
+    characters.
+
+    Works for py2py and py2js trees alike: render_list and indent are the
+    arguments the node's render_to_list() takes. The tree is walked one
+    node at a time by iter_render_steps(), and the text rendered so far is
+    handed out whenever it reaches chunk_size, so memory stays bounded by
+    the chunk size plus the largest leaf.
+    """
+    size = counted = 0
+    for _ in node.iter_render_steps(render_list, indent):
+        for i in range(counted, len(render_list)):
+            size += len(render_list[i])
+        counted = len(render_list)
+        if size >= chunk_size:
+            yield from _split(render_list, chunk_size)
+            del render_list[:]  # keeps the indent level of py2js lists
+            size = counted = 0
+    yield from _split(render_list, chunk_size)
+
+
+def _split(render_list: List[str], chunk_size: int) -> Iterator[str]:
+    text = ''.join(render_list)
+    for start in range(0, len(text), chunk_size):
+        yield text[start:start + chunk_size]
+
+
+async def arender(node, render_list: List[str], indent,
+                  chunk_size: int = CHUNK_SIZE,
+                  encoding: Optional[str] = None
+                  ) -> AsyncIterator[Union[str, bytes]]:
+    """
+    Asynchronous iter_chunks() that returns control to the event loop after
+    every chunk. With encoding the chunks are bytes, e.g. for use as a
+    streaming HTTP response body.
+    """
+    for chunk in iter_chunks(node, render_list, indent, chunk_size):
+        yield chunk.encode(encoding) if encoding else chunk
+        await asyncio.sleep(0)
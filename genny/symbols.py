@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from typing import Dict, List
+
+
+class SymbolTable:
+    """
+    Name index of the statements of one scope, e.g. a module or a class.
+
+    Statements are indexed by the names their symbol_names() method
+    returns. Statements whose unique_symbol attribute is true (functions,
+    classes ...) count as definitions: a name defined twice is reported by
+    duplicates(), or raises exception right away with strict. Statements
+    that share the scope of their parent (regions, shares_symbols) are
+    indexed here too, including whatever is added to them later.
+
+    Names are read when a statement is added: after renaming a statement
+    that is already in the table, call refresh() to index the new name.
+    """
+    def __init__(self, exception: type = KeyError, strict: bool = False):
+        self.exception = exception
+        self.strict = strict
+        self.symbols: Dict[str, List] = {}
+
+    def __contains__(self, name: str):
+        return name in self.symbols
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def add(self, statement):
+        if getattr(type(statement), 'shares_symbols', False):
+            statement.symbols = self
+            for child in statement.statements:
+                self.add(child)
+            return
+        names = getattr(statement, 'symbol_names', None)
+        if names is None:
+            return
+        for name in names():
+            entries = self.symbols.setdefault(name, [])
+            if self.strict and getattr(statement, 'unique_symbol', False) \
+                    and any(getattr(x, 'unique_symbol', False)
+                            for x in entries):
+                raise self.exception(f'Duplicate definition of "{name}"')
+            entries.append(statement)
+
+    def discard(self, statement):
+        if getattr(type(statement), 'shares_symbols', False):
+            for child in statement.statements:
+                self.discard(child)
+            return
+        names = getattr(statement, 'symbol_names', None)
+        if names is None:
+            return
+        names = names()
+        if not all(any(x is statement for x in self.symbols.get(name, ()))
+                   for name in names):
+            # renamed since it was added
+            names = [name for name, entries in self.symbols.items()
+                     if any(x is statement for x in entries)]
+        for name in names:
+            entries = self.symbols.get(name, [])
+            if statement in entries:
+                entries.remove(statement)
+                if not entries:
+                    del self.symbols[name]
+
+    def refresh(self, statement):
+        """
+        Index statement under its current names, e.g. after renaming it
+        """
+        self.discard(statement)
+        self.add(statement)
+
+    def get(self, name: str):
+        """
+        Return the statement that binds name last, or None
+        """
+        entries = self.symbols.get(name)
+        return entries[-1] if entries else None
+
+    def definitions(self, name: str) -> List:
+        return list(self.symbols.get(name, ()))
+
+    def lookup(self, qualified_name: str):
+        """
+        Return the statement for a dotted name like "Class.method", or None.
+        Each part but the last has to name a statement with its own symbol
+        table.
+        """
+        table = self
+        statement = None
+        for part in qualified_name.split('.'):
+            if table is None:
+                return None
+            statement = table.get(part)
+            if statement is None:
+                return None
+            table = getattr(statement, 'symbols', None)
+            if not isinstance(table, SymbolTable):
+                table = None
+        return statement
+
+    def duplicates(self) -> Dict[str, List]:
+        """
+        Return the names defined more than once, with their definitions
+        """
+        result = {}
+        for name, entries in self.symbols.items():
+            definitions = [x for x in entries
+                           if getattr(x, 'unique_symbol', False)]
+            if len(definitions) > 1:
+                result[name] = definitions
+        return result
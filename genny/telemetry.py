@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+clock = time.perf_counter
+
+
+class FileStats:
+    """
+    What it took to save one file. Times are in seconds.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.node_count = 0
+        self.render_time = 0.0
+        self.encode_time = 0.0
+        self.write_time = 0.0
+        self.bytes_written = 0
+
+    @property
+    def total_time(self) -> float:
+        return self.render_time + self.encode_time + self.write_time
+
+    def __repr__(self):
+        return (f'FileStats({self.path!r}, nodes={self.node_count}, '
+                f'render={self.render_time:.6f}, '
+                f'encode={self.encode_time:.6f}, '
+                f'write={self.write_time:.6f}, '
+                f'bytes={self.bytes_written})')
+
+
+class RunStats:
+    """
+    Totals over all files and directories of one save run
+    """
+    def __init__(self):
+        self.files: List[FileStats] = []
+        self.directories = 0
+        self.mkdir_time = 0.0
+        self.elapsed = 0.0  # wall clock time of the whole run
+
+    def _total(self, attribute: str):
+        return sum(getattr(stats, attribute) for stats in self.files)
+
+    @property
+    def node_count(self) -> int:
+        return self._total('node_count')
+
+    @property
+    def render_time(self) -> float:
+        return self._total('render_time')
+
+    @property
+    def encode_time(self) -> float:
+        return self._total('encode_time')
+
+    @property
+    def write_time(self) -> float:
+        return self._total('write_time')
+
+    @property
+    def bytes_written(self) -> int:
+        return self._total('bytes_written')
+
+    def __repr__(self):
+        return (f'RunStats(files={len(self.files)}, '
+                f'directories={self.directories}, '
+                f'nodes={self.node_count}, '
+                f'render={self.render_time:.6f}, '
+                f'encode={self.encode_time:.6f}, '
+                f'write={self.write_time:.6f}, '
+                f'mkdir={self.mkdir_time:.6f}, '
+                f'bytes={self.bytes_written}, '
+                f'elapsed={self.elapsed:.6f})')
+
+
+class SaveListener:
+    """
+    Receives the events of save runs.
+
+    Pass an instance as the listener of Module.save(), Package.save() or
+    JSFile.save(). file_saved() is called after every file is written,
+    directory_created() after every directory, and run_finished() once the
+    outermost save returns, with the totals of the run. Subclass and override
+    the on_* methods, or pass callables for them.
+    """
+    def __init__(self,
+                 on_file: Optional[Callable[[FileStats], None]] = None,
+                 on_directory: Optional[Callable[[str, float], None]] = None,
+                 on_run: Optional[Callable[[RunStats], None]] = None):
+        self._on_file = on_file
+        self._on_directory = on_directory
+        self._on_run = on_run
+        self.depth = 0
+        self.run_stats: Optional[RunStats] = None
+        self.last_run: Optional[RunStats] = None
+        self._started = 0.0
+
+    def run_started(self):
+        self.depth += 1
+        if self.depth == 1:
+            self.run_stats = RunStats()
+            self._started = clock()
+
+    def run_ended(self):
+        self.depth -= 1
+        if self.depth == 0:
+            stats = self.run_stats
+            stats.elapsed = clock() - self._started
+            self.run_stats = None
+            self.last_run = stats
+            self.on_run(stats)
+
+    def file_saved(self, stats: FileStats):
+        self.run_stats.files.append(stats)
+        self.on_file(stats)
+
+    def directory_created(self, path: str, seconds: float):
+        self.run_stats.directories += 1
+        self.run_stats.mkdir_time += seconds
+        self.on_directory(path, seconds)
+
+    def on_file(self, stats: FileStats):
+        if self._on_file:
+            self._on_file(stats)
+
+    def on_directory(self, path: str, seconds: float):
+        if self._on_directory:
+            self._on_directory(path, seconds)
+
+    def on_run(self, stats: RunStats):
+        if self._on_run:
+            self._on_run(stats)
+
+
+@contextmanager
+def run(listener: Optional[SaveListener]):
+    """
+    Mark a save run; nested runs are reported as part of the outermost one
+    """
+    if listener is None:
+        yield
+        return
+    listener.run_started()
+    try:
+        yield
+    finally:
+        listener.run_ended()
+
+
+def count_nodes(root, node_type: type) -> int:
+    """
+    Count the nodes of type node_type reachable from root through instance
+    attributes, lists and tuples. Every node is counted once, also when it
+    is reachable through several attributes (e.g. the delegated block of a
+    py2js block statement) or shared between statements.
+    """
+    count = 0
+    seen = set()
+    pending = [root]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, node_type):
+            if id(value) in seen:
+                continue
+            seen.add(id(value))
+            count += 1
+            pending.extend(vars(value).values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+    return count
+
+
+def time_render(stats: Optional[FileStats], render: Callable[[], object]):
+    """
+    Call render, adding the time it took to stats
+    """
+    if stats is None:
+        return render()
+    start = clock()
+    result = render()
+    stats.render_time += clock() - start
+    return result
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import os
+from typing import Iterable, List, Optional
+
+from .telemetry import FileStats, clock
+
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+if IOV_MAX <= 0:
+    IOV_MAX = 1024
+
+FILE_MODE = 0o666
+
+
+def write_fragments(path: str, fragments: Iterable[str],
+                    encoding: str = 'utf-8',
+                    batch_size: int = IOV_MAX,
+                    stats: Optional[FileStats] = None) -> int:
+    """
+    Write rendered fragments to path without joining them first.
+
+    Fragments are encoded one at a time and handed to the kernel in batches
+    of at most batch_size buffers using os.writev(). Returns the number of
+    bytes written. Encode and write times are added to stats if given.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, FILE_MODE)
+    try:
+        return write_fragments_to_fd(fd, fragments, encoding, batch_size,
+                                     stats)
+    finally:
+        os.close(fd)
+
+
+def write_fragments_to_fd(fd: int, fragments: Iterable[str],
+                          encoding: str = 'utf-8',
+                          batch_size: int = IOV_MAX,
+                          stats: Optional[FileStats] = None) -> int:
+    if stats is not None:
+        return _write_fragments_timed(fd, fragments, encoding, batch_size,
+                                      stats)
+    batch_size = max(1, min(batch_size, IOV_MAX))
+    written = 0
+    batch = []
+    for fragment in fragments:
+        if not fragment:
+            continue
+        batch.append(fragment.encode(encoding))
+        if len(batch) >= batch_size:
+            written += write_buffers(fd, batch)
+            batch = []
+    if batch:
+        written += write_buffers(fd, batch)
+    return written
+
+
+def _write_fragments_timed(fd: int, fragments: Iterable[str], encoding: str,
+                           batch_size: int, stats: FileStats) -> int:
+    # the clock is read once per batch rather than once per fragment
+    batch_size = max(1, min(batch_size, IOV_MAX))
+    fragments = [fragment for fragment in fragments if fragment]
+    written = 0
+    for i in range(0, len(fragments), batch_size):
+        start = clock()
+        batch = [fragment.encode(encoding)
+                 for fragment in fragments[i:i + batch_size]]
+        encoded = clock()
+        written += write_buffers(fd, batch)
+        stats.encode_time += encoded - start
+        stats.write_time += clock() - encoded
+    stats.bytes_written += written
+    return written
+
+
+def write_text(path: str, text: str, encoding: str = 'utf-8',
+               stats: Optional[FileStats] = None) -> int:
+    """
+    Encode text and write it to path in one go. Returns the number of bytes
+    written. Encode and write times are added to stats if given.
+    """
+    start = clock()
+    data = text.encode(encoding)
+    encoded = clock()
+    with open(path, 'wb') as f:
+        f.write(data)
+    if stats is not None:
+        stats.encode_time += encoded - start
+        stats.write_time += clock() - encoded
+        stats.bytes_written += len(data)
+    return len(data)
+
+
+def write_platform_text(path: str, text: str, encoding: str = 'utf-8',
+                        stats: Optional[FileStats] = None) -> int:
+    """
+    write_text() with platform newlines, like open(path, 'w') writes them.
+    Translating the newlines counts as encode time in stats.
+    """
+    if os.linesep == '\n':
+        return write_text(path, text, encoding, stats)
+    start = clock()
+    text = text.replace('\n', os.linesep)
+    if stats is not None:
+        stats.encode_time += clock() - start
+    return write_text(path, text, encoding, stats)
+
+
+def write_buffers(fd: int, buffers: List[bytes]) -> int:
+    """
+    Write all buffers to fd, retrying after partial writes.
+    """
+    total = sum(len(b) for b in buffers)
+    if not hasattr(os, 'writev'):
+        # no vectored I/O on this platform (e.g. Windows)
+        for b in buffers:
+            _write_all(fd, b)
+        return total
+
+    remaining = total
+    views = [memoryview(b) for b in buffers]
+    while remaining:
+        count = os.writev(fd, views)
+        remaining -= count
+        if not remaining:
+            break
+        # drop buffers that were written completely, trim the partial one
+        while count >= len(views[0]):
+            count -= len(views[0])
+            views.pop(0)
+        views[0] = views[0][count:]
+    return total
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        count = os.write(fd, view)
+        view = view[count:]
@@ -0,0 +1,110 @@
+import importlib
+import os
+
+import pytest
+
+from genny import build
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(build, 'registry', {})
+    return build.registry
+
+
+def bump(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def register_copier(source, calls):
+    @build.generator('copy')
+    def copy(context):
+        calls.append(1)
+        text = context.read_text(source)
+        with open(context.output_path('out.txt'), 'w') as f:
+            f.write(text)
+
+
+def test_only_stale_generators_run(registry, tmp_path):
+    source = str(tmp_path / 'in.txt')
+    bump(source, 'one')
+    calls = []
+    register_copier(source, calls)
+    out = str(tmp_path / 'out')
+    assert build.build(output_dir=out, jobs=1) == ['copy']
+    assert build.build(output_dir=out, jobs=1) == []
+    assert build.build(output_dir=out, jobs=1, force=True) == ['copy']
+    bump(source, 'two')
+    assert build.build(output_dir=out, jobs=1) == ['copy']
+    assert len(calls) == 3
+    with open(os.path.join(out, 'out.txt')) as f:
+        assert f.read() == 'two'
+
+
+def test_inputs_are_fingerprinted(registry, tmp_path):
+    source = str(tmp_path / 'in.txt')
+    bump(source, 'one')
+    register_copier(source, [])
+    out = str(tmp_path / 'out')
+    build.build(output_dir=out, jobs=1)
+    state = build.load_state(os.path.join(out, build.STATE_FILE))
+    inputs = state['copy']['inputs']
+    assert inputs[os.path.abspath(source)] == build.fingerprint(source)
+    assert os.path.abspath(__file__) in inputs
+    assert state['copy']['failed'] is False
+
+
+def test_failed_generator_is_retried(registry, tmp_path):
+    attempts = []
+
+    @build.generator('flaky')
+    def flaky(context):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError('first attempt fails')
+
+    out = str(tmp_path)
+    with pytest.raises(build.BuildError, match='first attempt fails'):
+        build.build(output_dir=out, jobs=1)
+    assert build.build(output_dir=out, jobs=1, retry_failed=False) == []
+    assert build.build(output_dir=out, jobs=1) == ['flaky']
+    assert build.build(output_dir=out, jobs=1) == []
+
+
+def test_missing_output_dir_is_created(registry, tmp_path):
+    build.generator('noop')(lambda context: None)
+    out = str(tmp_path / 'missing' / 'dir')
+    assert build.build(['noop'], output_dir=out, jobs=1) == ['noop']
+    assert build.load_state(os.path.join(out, build.STATE_FILE))['noop']
+
+
+def test_changed_generator_module_is_reloaded(registry, tmp_path,
+                                              monkeypatch):
+    module_path = str(tmp_path / 'reloaded_generators.py')
+    template = ('from genny import build\n\n\n'
+                '@build.generator("gen")\n'
+                'def gen(context):\n'
+                '    return {!r}\n')
+    bump(module_path, template.format('old'))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    importlib.import_module('reloaded_generators')
+    sources, broken = {}, set()
+    assert build.reload_changed(None, sources, broken) == []
+    assert registry['gen'].func(None) == 'old'
+
+    bump(module_path, template.format('new'))
+    assert build.reload_changed(None, sources, broken) == \
+        ['reloaded_generators']
+    assert registry['gen'].func(None) == 'new'
+
+    bump(module_path, template.format('broken') + '(\n')
+    with pytest.raises(SyntaxError):
+        build.reload_changed(None, sources, broken)
+    assert broken == {'reloaded_generators'}
+    bump(module_path, template.format('fixed'))
+    build.reload_changed(None, sources, broken)
+    assert not broken
+    assert registry['gen'].func(None) == 'fixed'
@@ -0,0 +1,7 @@
+from genny.__main__ import main
+
+
+def test_unknown_generator(tmp_path, capsys):
+    code = main(['genny.build', '-o', str(tmp_path), '-g', 'no-such-gen'])
+    assert code == 1
+    assert 'unknown generator: no-such-gen' in capsys.readouterr().err
@@ -0,0 +1,69 @@
+import ast
+
+import pytest
+
+from genny.py2py import CompactTree, Py2PyException
+
+
+def parse(tree):
+    text = tree.render()
+    ast.parse(text)
+    return text
+
+
+def test_try_statement_round_trip():
+    tree = CompactTree()
+    statement = tree.try_()
+    statement.add('f()')
+    statement.except_('ValueError').add('g()')
+    statement.else_().add('h()')
+    statement.finally_().add('i()')
+    assert parse(tree) == ('try:\n    f()\nexcept ValueError:\n    g()\n'
+                           'else:\n    h()\nfinally:\n    i()\n')
+
+
+def test_loop_round_trip():
+    tree = CompactTree()
+    loop = tree.for_('x', 'xs')
+    loop.if_('x').add('break')
+    loop.else_().add('f()')
+    tree.while_('y').add('g()')
+    parse(tree)
+
+
+@pytest.mark.parametrize('keyword', ['for', 'while'])
+def test_finally_after_loop_else_is_rejected(keyword):
+    tree = CompactTree()
+    loop = tree.for_('x', 'xs') if keyword == 'for' else tree.while_('x')
+    loop.add('f()')
+    loop.else_().add('g()')
+    with pytest.raises(Py2PyException):
+        loop.finally_()
+
+
+def test_finally_after_if_else_is_rejected():
+    tree = CompactTree()
+    statement = tree.if_('x')
+    statement.else_()
+    with pytest.raises(Py2PyException):
+        statement.finally_()
+
+
+def test_empty_clause_gets_pass():
+    tree = CompactTree()
+    tree.def_('f')
+    assert parse(tree) == 'def f():\n    pass\n'
+
+
+def test_clause_with_empty_regions_gets_pass():
+    tree = CompactTree()
+    function = tree.def_('f')
+    function.region_('outer').region_('inner')
+    text = parse(tree)
+    assert text.splitlines()[1] == '    pass'
+
+
+def test_clause_with_region_statements_has_no_pass():
+    tree = CompactTree()
+    tree.def_('f').region_('body').add('return 1')
+    assert 'pass' not in parse(tree)
@@ -0,0 +1,21 @@
+import pytest
+
+from genny.py2py import DispatchTable, Py2PyException, SimpleStatement
+
+
+@pytest.mark.parametrize('keys', [(1, 2), ("'a'", "'b'")])
+def test_duplicate_keys(keys):
+    table = DispatchTable('handlers', ['value'])
+    table.case_(*keys).write(SimpleStatement('return 1'))
+    with pytest.raises(Py2PyException, match='Duplicate keys'):
+        table.case_(keys[1])
+
+
+def test_dispatch_renders_dict():
+    table = DispatchTable('handlers', ['value'])
+    table.case_(1, 2).write(SimpleStatement('return value'))
+    table.default_().write(SimpleStatement('return None'))
+    namespace = {}
+    exec(table.render(), namespace)
+    assert namespace['handlers'][2](5) == 5
+    assert table.call('3', '5') == 'handlers.get(3, handlers_default)(5)'
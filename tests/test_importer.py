@@ -0,0 +1,67 @@
+import linecache
+import sys
+import traceback
+
+import pytest
+
+from genny.py2py import (
+    MemoryImporter, Module, Package, SimpleStatement, clear_code_cache)
+
+
+@pytest.fixture
+def importer():
+    importer = MemoryImporter()
+    with importer:
+        yield importer
+    clear_code_cache()
+
+
+def test_module_load(importer):
+    module = Module('memory_module')
+    module.def_('f').write(SimpleStatement('return 42'))
+    loaded = module.load(importer)
+    assert loaded.f() == 42
+    assert sys.modules['memory_module'] is loaded
+
+
+def test_reload_after_change(importer):
+    module = Module('memory_changing')
+    module.add(SimpleStatement('value = 1'))
+    assert module.load(importer).value == 1
+    module.clear()
+    module.add(SimpleStatement('value = 2'))
+    assert module.load(importer).value == 2
+
+
+def test_package_load_with_lazy_submodules(importer):
+    package = Package('memory_pkg', lazy_submodules=True)
+    package.add_module('a').add(SimpleStatement('value = 1'))
+    package.add_sub_package('sub').add_module('b').add(
+        SimpleStatement('value = 2'))
+    loaded = package.load(importer)
+    assert 'memory_pkg.a' not in sys.modules
+    assert loaded.a.value == 1
+    assert loaded.sub.b.value == 2
+    assert 'a' in dir(loaded)
+    with pytest.raises(AttributeError, match='no attribute'):
+        loaded.missing
+
+
+def test_traceback_shows_source(importer):
+    module = Module('memory_failing')
+    module.def_('fail').write(SimpleStatement("raise ValueError('boom')"))
+    loaded = module.load(importer)
+    with pytest.raises(ValueError) as info:
+        loaded.fail()
+    text = ''.join(traceback.format_tb(info.tb))
+    assert "raise ValueError('boom')" in text
+    linecache.clearcache()
+
+
+def test_uninstall_removes_modules():
+    importer = MemoryImporter()
+    importer.add_source('memory_gone', 'x = 1\n')
+    assert importer.import_module('memory_gone').x == 1
+    importer.uninstall()
+    assert 'memory_gone' not in sys.modules
+    assert importer not in sys.meta_path
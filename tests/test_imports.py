@@ -0,0 +1,27 @@
+from genny.py2py import Module, SimpleStatement
+
+
+def make_module(name):
+    module = Module(name, prune_imports=True)
+    module.add_import('import os\n')
+    module.add_import('from sys import argv, path\n')
+    module.add_import('import json\n', keep=True)
+    module.write(SimpleStatement('x = path'))
+    return module
+
+
+def test_unused_imports_are_pruned():
+    assert make_module('m').render() == \
+        'from sys import path\nimport json\n\nx = path\n'
+
+
+def test_package_init_imports_are_kept():
+    text = make_module('__init__').render()
+    assert 'import os\n' in text
+    assert 'from sys import argv, path\n' in text
+
+
+def test_names_in_all_are_kept():
+    module = make_module('m')
+    module.write(SimpleStatement("__all__ = ['argv']"))
+    assert 'from sys import argv, path\n' in module.render()
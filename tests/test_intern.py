@@ -0,0 +1,64 @@
+import gc
+
+import pytest
+
+from genny.py2js import base as js_base
+from genny.py2js.statements import ClassMethod
+from genny.py2py import Module, base
+
+
+@pytest.fixture
+def interning(monkeypatch):
+    monkeypatch.setattr(base, 'INTERN_LEAVES', True)
+    monkeypatch.setattr(js_base, 'INTERN_LEAVES', True)
+    yield
+    base.clear_interned_leaves()
+    js_base.clear_interned_leaves()
+
+
+def test_equal_leaves_are_shared(interning):
+    module = Module('m')
+    first = module.add('x = 1')
+    second = module.def_('f').clause.add('x = 1')
+    assert first is second
+    assert first.parent is None
+    assert module.render() == 'x = 1\ndef f():\n    x = 1\n'
+
+
+def test_equal_clause_headers_are_shared(interning):
+    module = Module('m')
+    a = module.if_('x')
+    b = module.if_('x')
+    a.else_().write('pass')
+    b.else_().write('pass')
+    assert a.if_clause._header is b.if_clause._header
+    assert a.else_clause._header is b.else_clause._header
+
+
+def test_changing_a_shared_header_copies_it(interning):
+    module = Module('m')
+    a = module.if_('x')
+    a.write('f()')
+    b = module.if_('x')
+    b.write('g()')
+    a.if_clause.header.set_content('y')
+    assert a.if_clause._header is not b.if_clause._header
+    assert module.render() == 'if y:\n    f()\nif x:\n    g()\n'
+
+
+def test_return_without_value_is_shared(interning):
+    first = ClassMethod('f')
+    first.return_()
+    second = ClassMethod('g')
+    second.return_()
+    assert first.code_block.statements[0] is \
+        second.code_block.statements[0]
+
+
+def test_unused_leaves_are_dropped(interning):
+    module = Module('m')
+    module.add('x = 1')
+    assert len(base._leaf_cache) == 1
+    del module
+    gc.collect()
+    assert len(base._leaf_cache) == 0
@@ -0,0 +1,50 @@
+import importlib
+import sys
+
+import pytest
+
+from genny.py2py import Module, NumericArray, Py2PyException
+
+VALUES = {
+    'small': [1, -2, 3],
+    'wide': [2 ** 40, -1],
+    'real': [0.5, -1.25, 3.0],
+}
+
+
+def make_module(name, sidecar=False):
+    module = Module(name)
+    for array_name, values in VALUES.items():
+        module.add(NumericArray(array_name, values,
+                                sidecar=array_name + '.bin' if sidecar
+                                else None))
+    return module
+
+
+def test_round_trip():
+    namespace = {}
+    exec(make_module('arrays').render(), namespace)
+    del namespace['__builtins__']
+    assert sorted(namespace) == sorted(VALUES)
+    for name, values in VALUES.items():
+        assert list(namespace[name]) == values
+
+
+def test_round_trip_sidecar(tmp_path, monkeypatch):
+    make_module('sidecar_arrays', sidecar=True).save(str(tmp_path))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module('sidecar_arrays')
+    try:
+        names = [name for name in vars(module) if not name.startswith('__')]
+        assert sorted(names) == sorted(VALUES)
+        for name, values in VALUES.items():
+            assert list(getattr(module, name)) == values
+    finally:
+        del sys.modules['sidecar_arrays']
+
+
+def test_typecode():
+    assert NumericArray('a', [1, 2]).values.typecode == 'b'
+    assert NumericArray('a', [1, 2], typecode='H').values.typecode == 'H'
+    with pytest.raises(Py2PyException):
+        NumericArray('a', [2 ** 70])
@@ -0,0 +1,88 @@
+import pytest
+
+from genny.py2py import Assign, Module, SimpleStatement, optimize
+from genny.py2py.optimize import fold_expression
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1 + 2', '3'),
+    ('-1 + 2', '1'),
+    ('2 ** 10', '1024'),
+    ("'a' * 3", "'aaa'"),
+    ('not True', 'False'),
+    ('1 < 2 < 3', 'True'),
+    ('x if 0 else y', 'y'),
+    ('True and x', 'x'),
+    ('False and f()', 'False'),
+])
+def test_fold(text, expected):
+    assert fold_expression(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    '-1',
+    '-1.5',
+    'f(a,b) if x else -1',
+    'x + 1',
+    'f() and True',
+    '2 ** 100000',
+    "'a' * 1000",
+    '1 / 0',
+    'not valid python (',
+])
+def test_fold_leaves_untouched(text):
+    assert fold_expression(text) == text
+
+
+def test_fold_assign():
+    module = Module('m')
+    module.write(Assign('x', '60 * 60'))
+    module.write(Assign('y', '-1'))
+    optimize(module)
+    assert module.render() == 'x = 3600\ny = -1\n'
+
+
+def test_prune_if():
+    module = Module('m')
+    if_statement = module.if_('1 > 2')
+    if_statement.write(SimpleStatement('a()'))
+    if_statement.elif_('x').write(SimpleStatement('b()'))
+    if_statement.else_().write(SimpleStatement('c()'))
+    optimize(module)
+    assert module.render() == 'if x:\n    b()\nelse:\n    c()\n'
+
+
+def test_prune_if_true_branch():
+    module = Module('m')
+    if_statement = module.if_('True')
+    if_statement.write(SimpleStatement('a()'))
+    if_statement.else_().write(SimpleStatement('b()'))
+    optimize(module)
+    assert module.render() == 'a()\n'
+
+
+def test_prune_while():
+    module = Module('m')
+    while_statement = module.while_('0')
+    while_statement.write(SimpleStatement('a()'))
+    while_statement.else_().write(SimpleStatement('b()'))
+    optimize(module)
+    assert module.render() == 'b()\n'
+
+
+def test_keep_scope_changing_branch():
+    module = Module('m')
+    function = module.def_('f')
+    if_statement = function.if_('False')
+    if_statement.write(SimpleStatement('yield 1'))
+    optimize(module)
+    assert 'yield 1' in module.render()
+
+
+def test_removability_check_leaves_tree_unchanged():
+    module = Module('m')
+    function = module.def_('f')
+    if_statement = function.if_('False')
+    if_statement.elif_('False').write(SimpleStatement('yield 1'))
+    optimize(module)
+    assert if_statement.if_clause.suite.statements == []
@@ -0,0 +1,85 @@
+import importlib
+import sys
+
+import pytest
+
+from genny.py2py import PackageWriter, Py2PyException, SimpleStatement
+
+
+def test_modules_and_sub_packages(tmp_path):
+    with PackageWriter(str(tmp_path), 'pkg') as writer:
+        with writer.module('a') as module:
+            module.write(SimpleStatement('x = 1'))
+        with writer.module('sub.deeper.b') as module:
+            module.write(SimpleStatement('y = 2'))
+        writer.write(SimpleStatement('z = 3'))
+    package = tmp_path / 'pkg'
+    assert (package / 'a.py').read_text() == 'x = 1\n'
+    assert (package / 'sub' / 'deeper' / 'b.py').read_text() == 'y = 2\n'
+    assert (package / '__init__.py').read_text() == 'z = 3\n'
+    assert (package / 'sub' / '__init__.py').exists()
+    assert (package / 'sub' / 'deeper' / '__init__.py').exists()
+
+
+def test_failed_module_is_not_saved(tmp_path):
+    with PackageWriter(str(tmp_path), 'pkg') as writer:
+        with pytest.raises(ValueError):
+            with writer.module('a') as module:
+                module.write(SimpleStatement('x = 1'))
+                raise ValueError
+    assert not (tmp_path / 'pkg' / 'a.py').exists()
+
+
+def test_init_is_not_saved_after_error(tmp_path):
+    with pytest.raises(ValueError):
+        with PackageWriter(str(tmp_path), 'pkg') as writer:
+            with writer.module('a'):
+                pass
+            writer.sub_package('sub')
+            raise ValueError
+    package = tmp_path / 'pkg'
+    assert (package / 'a.py').exists()
+    assert not (package / '__init__.py').exists()
+    assert not (package / 'sub' / '__init__.py').exists()
+    assert writer.closed
+
+
+@pytest.mark.parametrize('second', ['a', 'sub'])
+def test_duplicate_names_are_rejected(tmp_path, second):
+    with PackageWriter(str(tmp_path), 'pkg') as writer:
+        with writer.module('a'):
+            pass
+        writer.sub_package('sub')
+        with pytest.raises(Py2PyException, match='Duplicate'):
+            with writer.module(second):
+                pass
+
+
+def test_closed_writer_rejects_modules(tmp_path):
+    with PackageWriter(str(tmp_path), 'pkg') as writer:
+        pass
+    with pytest.raises(Py2PyException, match='closed'):
+        with writer.module('a'):
+            pass
+
+
+def test_lazy_submodules(tmp_path, monkeypatch):
+    with PackageWriter(str(tmp_path), 'lazy_pkg',
+                       lazy_submodules=True) as writer:
+        with writer.module('a') as module:
+            module.write(SimpleStatement('x = 1'))
+        with writer.module('sub.b') as module:
+            module.write(SimpleStatement('y = 2'))
+    init_text = (tmp_path / 'lazy_pkg' / '__init__.py').read_text()
+    assert "_LAZY_SUBMODULES = frozenset(['a', 'sub'])" in init_text
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    try:
+        package = importlib.import_module('lazy_pkg')
+        assert 'lazy_pkg.a' not in sys.modules
+        assert package.a.x == 1
+        assert package.sub.b.y == 2
+    finally:
+        for name in list(sys.modules):
+            if name.startswith('lazy_pkg'):
+                del sys.modules[name]
@@ -0,0 +1,49 @@
+import multiprocessing
+
+import pytest
+
+from genny.py2js.project import JSProject
+from genny.py2js.statements import Function
+from genny.py2py import Module, SimpleStatement
+
+
+def make_project():
+    project = JSProject()
+    for i in range(3):
+        js_file = project.add_file('file{}.js'.format(i))
+        js_file.add_goog_provide('project.file{}'.format(i))
+        function = js_file.add(Function('f{}'.format(i)))
+        function.call_('console.log', [str(i)])
+    return project
+
+
+def test_render_all_with_workers_matches_serial():
+    project = make_project()
+    assert project.render_all(workers=2) == project.render_all(workers=1)
+
+
+def make_deep_module(depth):
+    module = Module('deep')
+    node = module
+    for i in range(depth):
+        node = node.if_('True')
+    node.write(SimpleStatement('x = 1'))
+    module.add(SimpleStatement('y = 2'))
+    return module
+
+
+def test_py2py_render_with_workers_matches_serial():
+    module = Module('m')
+    for i in range(50):
+        module.def_('f{}'.format(i)).write(SimpleStatement('return 1'))
+    assert module.render(workers=2) == module.render()
+
+
+@pytest.mark.parametrize('start_methods', [None, ['spawn']])
+def test_deep_tree_renders_with_workers(monkeypatch, start_methods):
+    if start_methods is not None:
+        # render as on platforms without fork, where chunks are pickled
+        monkeypatch.setattr(multiprocessing, 'get_all_start_methods',
+                            lambda: start_methods)
+    module = make_deep_module(5000)
+    assert module.render(workers=2) == module.render()
@@ -0,0 +1,47 @@
+import gc
+import weakref
+
+import pytest
+
+from genny.py2py import Module, Py2PyException, SimpleStatement
+
+
+def make_module():
+    module = Module('m')
+    for i in range(10):
+        function = module.def_('f{}'.format(i))
+        function.if_('x').write(SimpleStatement('return 1')).else_() \
+            .write(SimpleStatement('return 2'))
+    return module
+
+
+def test_discarded_tree_is_freed_without_gc():
+    module = make_module()
+    refs = [weakref.ref(node) for node in (module, module.statements[0])]
+    gc.disable()
+    try:
+        del module
+        assert [ref() for ref in refs] == [None, None]
+    finally:
+        gc.enable()
+
+
+def test_dedent_after_root_is_freed():
+    statement = Module('m').if_('x')
+    with pytest.raises(Py2PyException, match='keep a reference'):
+        statement.dedent()
+
+
+def test_proxy_method_after_parent_is_freed():
+    clause = Module('m').if_('x').if_clause
+    with pytest.raises(Py2PyException, match='keep a reference'):
+        clause.elif_('y')
+    with pytest.raises(Py2PyException, match='keep a reference'):
+        clause.suite.else_()
+
+
+def test_dedent_with_live_parent():
+    module = Module('m')
+    statement = module.if_('x')
+    assert statement.dedent() is module
+    assert statement.if_clause.dedent() is statement
@@ -0,0 +1,84 @@
+import ast
+import glob
+import os
+
+import pytest
+
+import genny
+from genny.py2py import SimpleStatement, parse_file, parse_module
+
+SOURCE = '''\
+#!/usr/bin/env python
+"""Docstring"""
+import os  # comment
+
+
+@decorator(1)
+def f(a,
+      b=(1, 2)) -> int:
+    # leading comment
+    return a + b
+
+
+class C(Base, metaclass=Meta):
+    x, y = 1, 2
+
+    def method(self):  pass
+
+    async def coroutine(self):
+        pass
+# trailing comment
+'''
+
+PACKAGE_DIR = os.path.dirname(genny.__file__)
+
+
+@pytest.mark.parametrize('path', sorted(
+    glob.glob(os.path.join(PACKAGE_DIR, '**', '*.py'), recursive=True)))
+def test_package_sources_round_trip(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        source = f.read()
+    assert parse_file(path).render() == source
+
+
+@pytest.mark.parametrize('source', [
+    '', '# only a comment\n', 'x = 1', 'a = 1; b = 2\r\nc = 3\r\n',
+    'def f(): return 1\n', 'class A: pass\n', SOURCE])
+def test_round_trip(source):
+    assert parse_module(source, 'm').render() == source
+
+
+def test_edit_renders_only_the_changed_statement():
+    module = parse_module(SOURCE, 'm')
+    module.lookup('f').write(SimpleStatement('# added'))
+    lines = module.render().splitlines()
+    expected = SOURCE.splitlines()
+    expected.insert(expected.index('    return a + b') + 1, '    # added')
+    assert lines == expected
+
+
+def test_rename_regenerates_header_only():
+    module = parse_module(SOURCE, 'm')
+    module.lookup('C').name = 'D'
+    source = module.render()
+    ast.parse(source)
+    assert 'class D(Base, metaclass=Meta):\n    x, y = 1, 2\n' in source
+    assert '    def method(self):  pass\n' in source
+    assert source.replace('class D', 'class C', 1) == SOURCE
+
+
+def test_add_method_to_parsed_class():
+    module = parse_module(SOURCE, 'm')
+    module.lookup('C').add_method('extra').write(SimpleStatement('return 1'))
+    source = module.render()
+    namespace = {'decorator': lambda x: lambda f: f,
+                 'Base': object, 'Meta': type}
+    exec(source, namespace)
+    assert namespace['C']().extra() == 1
+
+
+def test_source_text_edit_marks_parents():
+    module = parse_module(SOURCE, 'm')
+    function = module.lookup('f')
+    function.clause.suite.statements[0].text = '    return a - b\n'
+    assert '    return a - b\n' in module.render()
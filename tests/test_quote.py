@@ -0,0 +1,47 @@
+import ast
+import string
+
+import pytest
+
+from genny.py2js import quote_text
+
+TEXTS = [
+    '',
+    'plain text',
+    "it's",
+    'say "hi"',
+    'back\\slash',
+    'tab\tnew\nline\rreturn',
+    '\b\f\v\x00\x1f\x7f',
+    'caf\xe9 \u2615 \U0001d11e',
+    'line\u2028para\u2029',
+    'lone \ud800 surrogate',
+    ''.join(chr(c) for c in range(0x80)),
+]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+@pytest.mark.parametrize('quote_char', ["'", '"'])
+def test_round_trip(text, quote_char):
+    # the JS escapes used are valid Python escapes with the same meaning
+    quoted = quote_text(text, quote_char)
+    assert quoted[0] == quoted[-1] == quote_char
+    assert ast.literal_eval(quoted) == text
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_no_raw_line_terminators(text):
+    quoted = quote_text(text)
+    for c in '\n\r\u2028\u2029':
+        assert c not in quoted
+    quoted.encode('utf-8')
+
+
+def test_printable_ascii_matches_baseline():
+    text = string.ascii_letters + string.digits + \
+        ' !#$%&()*+,-./:;<=>?@[]^_`{|}~'
+    assert quote_text(text) == repr(text)
+
+
+def test_non_strings_are_converted():
+    assert quote_text(12) == "'12'"
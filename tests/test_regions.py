@@ -0,0 +1,35 @@
+import ast
+
+from genny import regions
+from genny.py2py import Module, SimpleStatement
+
+
+def test_empty_region_as_only_body_is_valid():
+    module = Module('m')
+    module.def_('f').region_('body')
+    if_statement = module.if_('True')
+    if_statement.region_('outer').region_('inner')
+    source = module.render()
+    ast.parse(source)
+    assert source.count('pass') == 2
+
+
+def test_region_with_statements_has_no_pass():
+    module = Module('m')
+    function = module.def_('f')
+    function.region_('body').write(SimpleStatement('return 1'))
+    function.region_('empty')
+    source = module.render()
+    ast.parse(source)
+    assert 'pass' not in source
+
+
+def test_region_markers_round_trip(tmp_path):
+    module = Module('m')
+    module.def_('f').region_('body').write(SimpleStatement('return 1'))
+    path = str(tmp_path / 'm.py')
+    module.save(str(tmp_path))
+    with open(path) as f:
+        source = f.read()
+    assert regions.begin_marker('#', 'body').strip() in source
+    assert regions.end_marker('#', 'body').strip() in source
@@ -0,0 +1,60 @@
+import importlib
+
+from genny.py2py import Assign, Module, SimpleStatement
+from genny.py2py.splitting import split_module
+
+
+def make_module():
+    module = Module('big')
+    module.add_import('from .helpers import H')
+    module.def_('get_h').write(SimpleStatement('return H'))
+    module.add(Assign('_part', "'user part'"))
+    module.add(Assign('_name', "'user name'"))
+    for i in range(20):
+        module.add(Assign('value_{}'.format(i), str(i)))
+    module.def_('get_value').write(SimpleStatement('return value_0 + 1'))
+    return module
+
+
+def test_within_budget_is_not_split():
+    assert split_module(make_module(), max_lines=1000) is None
+
+
+def test_split_package_imports(tmp_path, monkeypatch):
+    package = tmp_path / 'split_pkg'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    (package / 'helpers.py').write_text('H = 42\n')
+    assert make_module().save_split(str(package), max_lines=5)
+    assert len(list((package / 'big').glob('_part*.py'))) > 2
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    big = importlib.import_module('split_pkg.big')
+    assert big.get_h() == 42
+    assert big.get_value() == 1
+    assert big.value_19 == 19
+    assert big._part == 'user part'
+    assert big._name == 'user name'
+
+
+def test_generated_lines_are_short():
+    module = make_module()
+    for i in range(200):
+        module.add(Assign('name_{}'.format(i), str(i)))
+    sources = split_module(module, max_lines=5)
+    for source in sources.values():
+        assert max(len(line) for line in source.splitlines()) <= 79
+
+
+def test_split_parts_bind_lazy_imports(tmp_path, monkeypatch):
+    module = Module('lazy_big')
+    module.add_import('json', lazy=True)
+    for i in range(10):
+        module.def_('dump_{}'.format(i), ['value']).write(
+            SimpleStatement('return json.dumps(value)'))
+    assert module.save_split(str(tmp_path), max_lines=4)
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    lazy_big = importlib.import_module('lazy_big')
+    assert lazy_big.dump_0([1]) == '[1]'
+    assert lazy_big.dump_9({}) == '{}'
@@ -0,0 +1,26 @@
+import ast
+
+from genny.py2py import Module, SimpleStatement
+
+
+def test_simple_statements_end_their_line():
+    module = Module('m')
+    module.write(SimpleStatement('x = 1'))
+    module.write(SimpleStatement('y = 2'))
+    assert module.render() == 'x = 1\ny = 2\n'
+
+
+def test_function_calls_end_their_line():
+    module = Module('m')
+    module.call_('setup')
+    module.call_('print', 'x', "'y'", sep="''")
+    module.write(SimpleStatement('z = 3'))
+    text = module.render()
+    assert text == "setup()\nprint(x, 'y', sep='')\nz = 3\n"
+    ast.parse(text)
+
+
+def test_function_call_in_suite():
+    module = Module('m')
+    module.def_('f').call_('g', '1')
+    assert module.render() == 'def f():\n    g(1)\n'
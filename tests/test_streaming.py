@@ -0,0 +1,75 @@
+import asyncio
+import sys
+
+from genny.py2js.jsfile import JSFile
+from genny.py2js.statements import Function
+from genny.py2py import Module, SimpleStatement
+
+
+def make_module():
+    module = Module('m')
+    for i in range(50):
+        function = module.def_('f{}'.format(i))
+        function.if_('x').write(SimpleStatement('return {}'.format(i)))
+    return module
+
+
+def make_js_file():
+    js_file = JSFile('m.js')
+    for i in range(50):
+        function = js_file.add(Function('f{}'.format(i)))
+        function.call_('console.log', [str(i)])
+    return js_file
+
+
+def collect(agen):
+    async def run():
+        return [chunk async for chunk in agen]
+    return asyncio.run(run())
+
+
+def test_py2py_chunks_match_render():
+    module = make_module()
+    chunks = list(module.render_chunks(100))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert ''.join(chunks) == module.render()
+
+
+def test_py2py_chunks_keep_indent_level():
+    module = make_module()
+    chunks = module.render_chunks(100, indent_level=1)
+    assert ''.join(chunks) == module.render(indent_level=1)
+
+
+def test_py2js_chunks_match_render():
+    js_file = make_js_file()
+    chunks = list(js_file.render_chunks(100))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert ''.join(chunks) == js_file.render()
+
+
+def test_leaf_chunks():
+    statement = SimpleStatement('x = 1')
+    assert list(statement.render_chunks()) == [statement.render()]
+
+
+def test_deep_tree_chunks():
+    module = Module('deep')
+    node = module
+    for i in range(sys.getrecursionlimit() + 100):
+        node = node.if_('True')
+    node.write(SimpleStatement('x = 1'))
+    assert ''.join(module.render_chunks(1000)) == module.render()
+
+
+def test_arender_encodes_chunks():
+    module = make_module()
+    chunks = collect(module.arender(100, 'utf-8'))
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    assert b''.join(chunks) == module.render().encode('utf-8')
+
+    js_file = make_js_file()
+    chunks = collect(js_file.arender(100, 'utf-8'))
+    assert b''.join(chunks) == js_file.render().encode('utf-8')
@@ -0,0 +1,55 @@
+import ast
+
+import pytest
+
+from genny.py2py import Assign, Module, Py2PyException, SimpleStatement
+from genny.py2py.stubs import render_stub
+
+
+def test_assignment_stubs_parse():
+    module = Module('values')
+    module.add(Assign('a, (b, *c)', '1, (2, 3, 4)'))
+    module.add(Assign('d = e', '5'))
+    module.add(Assign('f', 'g == 1'))
+    module.add(Assign('h', 'dict(x=1)', type_hint='dict'))
+    module.add(Assign('obj.attr', '6'))
+    stub = render_stub(module)
+    ast.parse(stub)
+    lines = stub.splitlines()
+    for name in 'abcdef':
+        assert '{}: Any'.format(name) in lines
+    assert 'h: dict' in lines
+    assert 'from typing import Any' in lines
+    assert not any('attr' in line for line in lines)
+
+
+def test_def_and_class_stubs():
+    module = Module('api')
+    module.def_('f', ['x: int'], return_type='int').write(
+        SimpleStatement('return x'))
+    module.class_('C')
+    stub = render_stub(module)
+    ast.parse(stub)
+    assert 'def f(x: int) -> int: ...' in stub.splitlines()
+    assert 'class C:' in stub.splitlines()
+
+
+@pytest.mark.parametrize('lhs', ['h = i', 'a, b', '*a', 'f()'])
+def test_annotated_assign_needs_single_target(lhs):
+    with pytest.raises(Py2PyException, match='annotated'):
+        Assign(lhs, '1', type_hint='int')
+
+
+@pytest.mark.parametrize('lhs', ['h', 'obj.attr', 'table[0]'])
+def test_annotated_assign_renders_valid_python(lhs):
+    ast.parse(Assign(lhs, '1', type_hint='int').render())
+
+
+def test_lazy_imports_are_plain_imports_in_stubs():
+    module = Module('lazy')
+    module.add_import('json', lazy=True)
+    module.def_('f', return_type='json.JSONDecoder')
+    stub = render_stub(module)
+    ast.parse(stub)
+    assert 'import json' in stub.splitlines()
+    assert '_lazy_import' not in stub
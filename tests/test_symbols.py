@@ -0,0 +1,41 @@
+import pytest
+
+from genny.py2py import Module, Py2PyException, SimpleStatement
+from genny.symbols import SymbolTable
+
+
+def test_module_and_class_lookup():
+    module = Module('m')
+    cls = module.class_('C')
+    cls.add_method('f').write(SimpleStatement('return 1'))
+    assert module.lookup('C') is cls
+    assert module.lookup('C.f').name == 'f'
+    assert module.lookup('C.g') is None
+
+
+def test_duplicates_and_strict():
+    module = Module('m')
+    module.def_('f')
+    module.def_('f')
+    assert list(module.duplicates()) == ['f']
+    table = SymbolTable(Py2PyException, strict=True)
+    table.add(module.statements[0])
+    with pytest.raises(Py2PyException):
+        table.add(module.statements[1])
+
+
+def test_refresh_after_rename():
+    module = Module('m')
+    function = module.def_('old')
+    function.name = 'new'
+    assert module.lookup('new') is None
+    module.symbols.refresh(function)
+    assert module.lookup('new') is function
+    assert module.lookup('old') is None
+
+
+def test_clear_discards():
+    module = Module('m')
+    module.def_('f')
+    module.clear()
+    assert module.lookup('f') is None
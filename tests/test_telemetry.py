@@ -0,0 +1,43 @@
+from genny import telemetry
+from genny.py2js.base import Renderable as JSRenderable
+from genny.py2js.jsfile import JSFile
+from genny.py2js.statements import Function
+from genny.py2py import Module, SimpleStatement
+
+
+def test_count_nodes_counts_aliases_once():
+    js_file = JSFile()
+    js_file.add(Function('f'))
+    # the file, the function, its code block (also its delegated block)
+    # and the code block's fragment
+    assert telemetry.count_nodes(js_file, JSRenderable) == 4
+
+
+def test_module_save_reports_file(tmp_path):
+    files = []
+    module = Module('m')
+    module.def_('f').write(SimpleStatement('return 1'))
+    module.save(str(tmp_path), listener=telemetry.SaveListener(
+        on_file=files.append))
+    assert [stats.path for stats in files] == [str(tmp_path / 'm.py')]
+    assert files[0].bytes_written == (tmp_path / 'm.py').stat().st_size
+
+
+def test_module_save_times_encoding(tmp_path):
+    files = []
+    module = Module('m')
+    module.write(SimpleStatement("s = 'café'"))
+    module.save(str(tmp_path), listener=telemetry.SaveListener(
+        on_file=files.append))
+    assert files[0].encode_time > 0
+    assert files[0].write_time > 0
+
+
+def test_module_save_paths_write_utf8(tmp_path):
+    module = Module('m')
+    module.write(SimpleStatement("s = 'café'"))
+    module.save(str(tmp_path))
+    data = (tmp_path / 'm.py').read_bytes()
+    module.save(str(tmp_path), vectored=True)
+    assert (tmp_path / 'm.py').read_bytes() == data
+    assert "'café'".encode('utf-8') in data
@@ -0,0 +1,69 @@
+import pytest
+
+from genny.py2js.base import Py2JSException
+from genny.py2js.jsfile import JSFile
+from genny.py2js import treeshake
+from genny.py2js.statements import Function, FunctionCall, Let
+
+
+def make_file():
+    js_file = JSFile(es_module=True, tree_shake=True)
+    helper = js_file.add(Function('helper'))
+    helper.add(FunctionCall('console.log', ['1']))
+    api = js_file.add(Function('api'))
+    api.add(FunctionCall('helper'))
+    unused = js_file.add(Function('unused'))
+    unused.add(FunctionCall('api'))
+    js_file.add(Let('CONSTANT', '1'))
+    js_file.add(FunctionCall('setup'))  # no definition, always kept
+    return js_file
+
+
+def test_unreachable_definitions_are_dropped():
+    js_file = make_file()
+    js_file.add_export('api')
+    text = js_file.render()
+    assert 'function helper(' in text
+    assert 'function api(' in text
+    assert 'function unused(' not in text
+    assert 'CONSTANT' not in text
+    assert 'setup()' in text
+    assert text.rstrip().endswith('export { api };')
+
+
+def test_string_mention_keeps_definition():
+    js_file = make_file()
+    js_file.add(FunctionCall('register', ['"CONSTANT"']))
+    js_file.add_export('api')
+    assert 'let CONSTANT' in js_file.render()
+
+
+def test_unknown_export():
+    js_file = make_file()
+    js_file.add_export('missing')
+    with pytest.raises(Py2JSException, match='missing'):
+        js_file.render()
+
+
+def test_without_tree_shake_everything_is_kept():
+    js_file = make_file()
+    js_file.tree_shake = False
+    js_file.add_export('api')
+    assert 'function unused(' in js_file.render()
+
+
+def test_side_effecting_let_is_kept():
+    statement_list = [Let('x', 'register()'), Let('y', '"pure"'),
+                      Function('f'), Let('g', Function())]
+    texts = treeshake.shake(statement_list, ['f'])
+    assert len(texts) == 2
+    assert 'register()' in texts[0]
+    assert 'function f(' in texts[1]
+
+
+def test_imports_and_exports_need_an_es_module():
+    js_file = JSFile()
+    with pytest.raises(Py2JSException, match='ES module'):
+        js_file.add_import('./lib.js', ['a'])
+    with pytest.raises(Py2JSException, match='ES module'):
+        js_file.add_export('a')
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+from genny import writers
+from genny.py2js.jsfile import JSFile
+from genny.py2js.statements import Function
+from genny.py2py import Module, SimpleStatement
+
+FRAGMENTS = ['def f():\n', '    ', "return 'é'\n", '', 'x = 1\n'] * 50
+
+
+def make_deep_module(depth):
+    module = Module('deep')
+    node = module
+    for i in range(depth):
+        node = node.if_('x{}'.format(i))
+    node.write(SimpleStatement('y = 1'))
+    return module
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 7, writers.IOV_MAX])
+def test_write_fragments_matches_join(tmp_path, batch_size):
+    path = str(tmp_path / 'out')
+    expected = ''.join(FRAGMENTS).encode('utf-8')
+    assert writers.write_fragments(path, FRAGMENTS,
+                                   batch_size=batch_size) == len(expected)
+    with open(path, 'rb') as f:
+        assert f.read() == expected
+
+
+def test_partial_writes_are_retried(tmp_path, monkeypatch):
+    writev = os.writev
+
+    def short_writev(fd, buffers):
+        # at most 3 bytes of the first buffer per call
+        return writev(fd, [bytes(buffers[0][:3])])
+
+    monkeypatch.setattr(os, 'writev', short_writev)
+    path = str(tmp_path / 'out')
+    writers.write_fragments(path, FRAGMENTS)
+    with open(path, 'rb') as f:
+        assert f.read() == ''.join(FRAGMENTS).encode('utf-8')
+
+
+@pytest.mark.parametrize('depth', [10, sys.getrecursionlimit() + 100])
+def test_vectored_module_save_matches_render(tmp_path, depth):
+    module = make_deep_module(depth)
+    module.save(str(tmp_path), vectored=True)
+    vectored = (tmp_path / 'deep.py').read_bytes()
+    module.save(str(tmp_path))
+    assert vectored == (tmp_path / 'deep.py').read_bytes()
+    assert vectored == module.render().encode('utf-8')
+
+
+def test_vectored_js_save_matches_render(tmp_path):
+    js_file = JSFile()
+    for i in range(20):
+        js_file.add(Function('f{}'.format(i))).call_('g', ["'é'"])
+    path = str(tmp_path / 'f.js')
+    js_file.save(path, vectored=True)
+    with open(path, 'rb') as f:
+        assert f.read() == js_file.render().encode('utf-8')
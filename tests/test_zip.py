@@ -0,0 +1,67 @@
+import importlib
+import os
+import sys
+import zipfile
+
+import pytest
+
+from genny.py2py import Package, Py2PyException, SimpleStatement
+
+
+def make_package(name, depth=sys.getrecursionlimit() + 100):
+    package = Package(name)
+    package.write(SimpleStatement('from .a import x'))
+    package.add_module('a').write(SimpleStatement("x = 'é'"))
+    sub = package.add_sub_package('sub')
+    node = sub.add_module('deep')
+    for i in range(depth):
+        node = node.if_('True')
+    node.write(SimpleStatement('y = 2'))
+    return package
+
+
+def saved_files(root):
+    files = {}
+    for dir_name, _, file_names in os.walk(root):
+        for file_name in file_names:
+            path = os.path.join(dir_name, file_name)
+            arc_name = os.path.relpath(path, root).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                files[arc_name] = f.read()
+    return files
+
+
+def test_zip_matches_saved_package(tmp_path):
+    package = make_package('zipped')
+    package.save(str(tmp_path / 'dir'))
+    package.save_zip(str(tmp_path / 'p.zip'))
+    with zipfile.ZipFile(str(tmp_path / 'p.zip')) as f:
+        archived = dict((name, f.read(name)) for name in f.namelist())
+    assert archived == saved_files(str(tmp_path / 'dir'))
+
+
+@pytest.mark.parametrize('compile_pyc', [False, True])
+def test_zip_is_importable(tmp_path, monkeypatch, compile_pyc):
+    name = 'zipped_pyc' if compile_pyc else 'zipped_py'
+    zip_path = str(tmp_path / 'p.zip')
+    # Python compiles at most 100 nested blocks
+    make_package(name, 10).save_zip(zip_path, compile_pyc=compile_pyc)
+    if compile_pyc:
+        with zipfile.ZipFile(zip_path) as f:
+            assert name + '/a.pyc' in f.namelist()
+    monkeypatch.syspath_prepend(zip_path)
+    try:
+        package = importlib.import_module(name)
+        assert package.x == 'é'
+        assert importlib.import_module(name + '.sub.deep').y == 2
+    finally:
+        for module_name in list(sys.modules):
+            if module_name.startswith(name):
+                del sys.modules[module_name]
+
+
+def test_sidecar_arrays_are_rejected(tmp_path):
+    package = Package('arrays')
+    package.add_module('a').numeric_array_('t', [1, 2], sidecar='t.bin')
+    with pytest.raises(Py2PyException):
+        package.save_zip(str(tmp_path / 'p.zip'))